@@ -0,0 +1,70 @@
+"""
+Сериализация строк values() в словари ответа API без создания моделей.
+Поле ответа -> путь в values() относительно поста (или записи ленты).
+"""
+from posts.models import Post
+
+POST_FIELDS = {
+    'id': 'pk',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}
+# Кешируемые ленты комментарии не сбрасывают, поэтому числа
+# комментариев в них нет: оно бы устаревало.
+FEED_FIELDS = {
+    name: path for name, path in POST_FIELDS.items()
+    if name != 'comments_count'
+}
+COMMENT_FIELDS = {
+    'id': 'pk',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+}
+PROFILE_FIELDS = {
+    'username': 'username',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'posts_count': 'stats__posts_count',
+    'followers_count': 'stats__followers_count',
+    'following_count': 'stats__following_count',
+}
+
+image_storage = Post._meta.get_field('image').storage
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def select_fields(request, available, param='fields'):
+    """Поля из ?fields=a,b с проверкой; без параметра — все."""
+    requested = request.GET.get(param)
+    if not requested:
+        return list(available)
+    fields = [field for field in requested.split(',') if field]
+    unknown = set(fields) - set(available)
+    if unknown:
+        raise BadRequest(
+            f'Неизвестные поля: {", ".join(sorted(unknown))}'
+        )
+    return fields
+
+
+def lookups(available, fields, prefix='', extra=()):
+    """Аргументы для values(): поля ответа и ключи курсора."""
+    paths = [prefix + available[field] for field in fields]
+    return list(dict.fromkeys([*extra, *paths]))
+
+
+def serialize(row, available, fields, prefix=''):
+    data = {field: row[prefix + available[field]] for field in fields}
+    if 'image' in data:
+        data['image'] = (
+            image_storage.url(data['image']) if data['image'] else None
+        )
+    return data
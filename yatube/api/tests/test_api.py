@@ -0,0 +1,145 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(PGN_COUNT=2)
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='HasNoName', first_name='Имя'
+        )
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание группы'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'Пост {i}', group=cls.group
+            )
+            for i in range(3)
+        ]
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(3):
+            Comment.objects.create(
+                post=cls.posts[0], author=cls.user, text=f'Комментарий {i}'
+            )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def walk(self, client, url):
+        """Тексты всех постов ленты, по страницам через next."""
+        texts = []
+        while url:
+            data = client.get(url).json()
+            texts += [post['text'] for post in data['results']]
+            url = data['next']
+        return texts
+
+    def test_feeds_paginated_by_cursor(self):
+        """Ленты API отдают все посты по курсорам, новые первыми."""
+        expected = ['Пост 2', 'Пост 1', 'Пост 0']
+        urls = [
+            reverse('api:posts'),
+            reverse('api:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('api:profile_posts', kwargs={'username': self.author}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.walk(self.client, url), expected)
+        self.assertEqual(
+            self.walk(self.authorized_client, reverse('api:follow')),
+            expected
+        )
+
+    def test_sparse_fields(self):
+        """?fields= ограничивает поля, неизвестное поле — ошибка 400."""
+        response = self.client.get(
+            reverse('api:posts'), {'fields': 'id,author'}
+        )
+        self.assertEqual(
+            response.json()['results'][0],
+            {'id': self.posts[2].pk, 'author': 'Author'}
+        )
+        response = self.client.get(reverse('api:posts'), {'fields': 'pwd'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cached_feeds_without_comments_count(self):
+        """В кешируемых лентах нет числа комментариев."""
+        data = self.client.get(reverse('api:posts')).json()
+        self.assertNotIn('comments_count', data['results'][0])
+        response = self.client.get(
+            reverse('api:posts'), {'fields': 'comments_count'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_post_detail_with_comments(self):
+        """Пост отдаётся вместе с первой страницей комментариев."""
+        url = reverse('api:post_detail', kwargs={'post_id': self.posts[0].pk})
+        data = self.client.get(url, {'limit': 2}).json()
+        self.assertEqual(data['post']['text'], 'Пост 0')
+        self.assertEqual(data['post']['comments_count'], 3)
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']['results']],
+            ['Комментарий 0', 'Комментарий 1']
+        )
+        self.assertIsNotNone(data['comments']['next'])
+
+    def test_errors(self):
+        """Ошибки отдаются в JSON с нужным статусом."""
+        cases = {
+            reverse('api:follow'): 401,
+            reverse('api:profile', kwargs={'username': 'nobody'}): 404,
+            reverse('api:post_detail', kwargs={'post_id': 999}): 404,
+            reverse('api:batch') + '?posts=a': 400,
+            reverse('api:posts') + '?limit=0': 400,
+        }
+        for url, status in cases.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', response.json())
+        response = self.client.post(reverse('api:posts'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_batch_in_one_round_trip(self):
+        """batch отдаёт посты и профили в порядке запроса за два запроса."""
+        ids = f'{self.posts[1].pk},999,{self.posts[0].pk}'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('api:batch'), {
+                'posts': ids,
+                'users': 'Author,nobody,HasNoName',
+                'post_fields': 'id,text',
+                'user_fields': 'username,first_name,posts_count',
+            })
+        self.assertEqual(len(queries), 2)
+        data = response.json()
+        self.assertEqual(data['posts'], [
+            {'id': self.posts[1].pk, 'text': 'Пост 1'},
+            {'id': self.posts[0].pk, 'text': 'Пост 0'},
+        ])
+        self.assertEqual(data['users'], [
+            {'username': 'Author', 'first_name': '', 'posts_count': 3},
+            {'username': 'HasNoName', 'first_name': 'Имя', 'posts_count': 0},
+        ])
+
+    def test_feed_invalidated_on_write(self):
+        """Кеш ленты API сбрасывается новым постом."""
+        self.client.get(reverse('api:posts'))
+        Post.objects.create(author=self.author, text='Новый')
+        data = self.client.get(reverse('api:posts')).json()
+        self.assertEqual(data['results'][0]['text'], 'Новый')
@@ -0,0 +1,205 @@
+from functools import partial, wraps
+
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+
+from core.cache import cache_page_versioned
+from posts import timeline
+from posts.models import Comment, Group, Post, User
+from posts.utils import (
+    GLOBAL_SCOPE, KeysetPaginator, MergedKeysetPaginator, author_scope,
+    group_scope
+)
+from posts.views import post_detail_scopes
+from .serializers import (
+    COMMENT_FIELDS, FEED_FIELDS, POST_FIELDS, PROFILE_FIELDS, BadRequest,
+    lookups, select_fields, serialize
+)
+
+
+def error(status, detail):
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def api_view(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return error(405, 'Метод не поддерживается.')
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return error(404, 'Не найдено.')
+        except BadRequest as exc:
+            return error(400, str(exc))
+    return wrapper
+
+
+def _int_list(request, param, limit):
+    try:
+        value = request.GET.get(param, '')
+        return [int(item) for item in value.split(',') if item][:limit]
+    except ValueError:
+        raise BadRequest(f'{param}: ожидаются числа через запятую')
+
+
+def _page_size(request, default):
+    try:
+        size = int(request.GET.get('limit', default))
+    except ValueError:
+        raise BadRequest('limit: ожидается число')
+    if not 1 <= size <= settings.API_PAGE_MAX:
+        raise BadRequest(f'limit: от 1 до {settings.API_PAGE_MAX}')
+    return size
+
+
+def _link(request, page, direction):
+    if direction == 'next' and page.has_next():
+        return f'{request.path}?{page.next_page_query}'
+    if direction == 'previous' and page.has_previous():
+        return f'{request.path}?{page.previous_page_query}'
+    return None
+
+
+def keyset_page(request, queryset, available, fields, keys=('created', 'pk'),
+                prefix='', per_page=None, descending=True):
+    rows = queryset.values(*lookups(available, fields, prefix, keys))
+    paginator = KeysetPaginator(
+        rows,
+        _page_size(request, per_page or settings.PGN_COUNT),
+        keys,
+        descending
+    )
+    page = paginator.get_page(request, **paginator.cursors(request))
+    return {
+        'results': [
+            serialize(row, available, fields, prefix) for row in page
+        ],
+        'next': _link(request, page, 'next'),
+        'previous': _link(request, page, 'previous'),
+    }
+
+
+def feed(request, queryset, keys=('created', 'pk'), prefix=''):
+    fields = select_fields(request, FEED_FIELDS)
+    return JsonResponse(
+        keyset_page(request, queryset, FEED_FIELDS, fields, keys, prefix)
+    )
+
+
+@api_view
+@cache_page_versioned(lambda request: [GLOBAL_SCOPE])
+def posts(request):
+    return feed(request, Post.objects.all())
+
+
+@api_view
+@cache_page_versioned(lambda request, slug: [group_scope(slug)])
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    return feed(request, Post.objects.filter(group=group))
+
+
+@api_view
+@cache_page_versioned(lambda request, username: [author_scope(username)])
+def profile(request, username):
+    fields = select_fields(request, PROFILE_FIELDS)
+    row = get_object_or_404(
+        User.objects.values(*lookups(PROFILE_FIELDS, fields)),
+        username=username
+    )
+    return JsonResponse(serialize(row, PROFILE_FIELDS, fields))
+
+
+@api_view
+@cache_page_versioned(lambda request, username: [author_scope(username)])
+def profile_posts(request, username):
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    return feed(request, Post.objects.filter(author=author))
+
+
+@api_view
+@cache_page_versioned(post_detail_scopes)
+def post_detail(request, post_id):
+    fields = select_fields(request, POST_FIELDS)
+    row = get_object_or_404(
+        Post.objects.values(*lookups(POST_FIELDS, fields)), pk=post_id
+    )
+    comment_fields = select_fields(request, COMMENT_FIELDS, 'comment_fields')
+    comments = keyset_page(
+        request,
+        Comment.objects.filter(post_id=post_id),
+        COMMENT_FIELDS,
+        comment_fields,
+        per_page=settings.COMMENTS_PGN_COUNT,
+        descending=False
+    )
+    return JsonResponse({
+        'post': serialize(row, POST_FIELDS, fields),
+        'comments': comments,
+    })
+
+
+@api_view
+def follow(request):
+    if not request.user.is_authenticated:
+        return error(401, 'Нужна авторизация.')
+    fields = select_fields(request, POST_FIELDS)
+    per_page = _page_size(request, settings.PGN_COUNT)
+    paginator = MergedKeysetPaginator(
+        [
+            (
+                KeysetPaginator(
+                    queryset.values(
+                        *lookups(POST_FIELDS, fields, prefix, keys)
+                    ),
+                    per_page,
+                    keys
+                ),
+                partial(
+                    serialize, available=POST_FIELDS, fields=fields,
+                    prefix=prefix
+                )
+            )
+            for queryset, keys, prefix in timeline.feed_sources(request.user)
+        ],
+        per_page
+    )
+    page = paginator.get_page(request, **paginator.cursors(request))
+    return JsonResponse({
+        'results': page.object_list,
+        'next': _link(request, page, 'next'),
+        'previous': _link(request, page, 'previous'),
+    })
+
+
+@api_view
+def batch(request):
+    """Несколько постов и профилей за один запрос: ?posts=1,2&users=a,b."""
+    post_ids = _int_list(request, 'posts', settings.API_BATCH_MAX)
+    usernames = [
+        name for name in request.GET.get('users', '').split(',') if name
+    ][:settings.API_BATCH_MAX]
+    post_fields = select_fields(request, POST_FIELDS, 'post_fields')
+    user_fields = select_fields(request, PROFILE_FIELDS, 'user_fields')
+    found_posts = {
+        row['pk']: row for row in Post.objects.filter(
+            pk__in=post_ids
+        ).values(*lookups(POST_FIELDS, post_fields, extra=('pk',)))
+    }
+    found_users = {
+        row['username']: row for row in User.objects.filter(
+            username__in=usernames
+        ).values(*lookups(PROFILE_FIELDS, user_fields, extra=('username',)))
+    }
+    return JsonResponse({
+        'posts': [
+            serialize(found_posts[pk], POST_FIELDS, post_fields)
+            for pk in post_ids if pk in found_posts
+        ],
+        'users': [
+            serialize(found_users[name], PROFILE_FIELDS, user_fields)
+            for name in usernames if name in found_users
+        ],
+    })
@@ -0,0 +1,122 @@
+"""
+Сравнение бэкендов кеша: LocMemCache, FileBasedCache и общего SQLiteCache.
+Замеряются задержки set, get (попадание и промах), get_many и incr, а для
+общих между процессами бэкендов — ещё и одновременные incr из нескольких
+процессов: сколько их дошло и с какой скоростью.
+"""
+import multiprocessing
+import os
+import random
+import string
+import time
+
+from django.utils.module_loading import import_string
+
+from .runner import percentiles
+
+BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', False),
+    'filebased': (
+        'django.core.cache.backends.filebased.FileBasedCache', True
+    ),
+    'sqlite': ('core.sqlitecache.BaseSQLiteCache', True),
+}
+OPERATIONS = ('set', 'get_hit', 'get_miss', 'get_many', 'incr')
+MANY_KEYS = 10
+
+
+def make_cache(name, directory, max_entries):
+    path, shared = BACKENDS[name]
+    location = os.path.join(directory, name)
+    if name == 'sqlite':
+        location = os.path.join(location, 'cache.sqlite3')
+    return import_string(path)(
+        location if shared else name,
+        {'OPTIONS': {'MAX_ENTRIES': max_entries}}
+    )
+
+
+def _value(size):
+    # Текст похож на отрисованный HTML: сжимается, но не идеально.
+    return ''.join(random.choices(string.ascii_letters + ' <>/', k=size))
+
+
+def _latencies(operation, iterations):
+    samples = []
+    for index in range(iterations):
+        start = time.perf_counter()
+        operation(index)
+        samples.append((time.perf_counter() - start) * 1000)
+    p50, p95, p99 = percentiles(samples)
+    return {
+        'p50_ms': round(p50, 4),
+        'p95_ms': round(p95, 4),
+        'p99_ms': round(p99, 4),
+        'ops_per_s': round(len(samples) / (sum(samples) / 1000), 1),
+    }
+
+
+def measure(cache, iterations, value_size):
+    value = _value(value_size)
+    keys = [f'key:{index}' for index in range(iterations)]
+    cache.set('counter', 0)
+    operations = {
+        'set': lambda index: cache.set(keys[index], value),
+        'get_hit': lambda index: cache.get(keys[index]),
+        'get_miss': lambda index: cache.get(f'missing:{index}'),
+        'get_many': lambda index: cache.get_many(
+            keys[index:index + MANY_KEYS]
+        ),
+        'incr': lambda index: cache.incr('counter'),
+    }
+    return {
+        name: _latencies(operations[name], iterations)
+        for name in OPERATIONS
+    }
+
+
+def _increment(name, directory, max_entries, times):
+    cache = make_cache(name, directory, max_entries)
+    for _ in range(times):
+        cache.incr('shared_counter')
+
+
+def measure_shared(name, directory, max_entries, processes, times):
+    """incr из нескольких процессов: потерянные обновления и скорость."""
+    cache = make_cache(name, directory, max_entries)
+    cache.set('shared_counter', 0)
+    context = multiprocessing.get_context('fork')
+    workers = [
+        context.Process(
+            target=_increment, args=(name, directory, max_entries, times)
+        )
+        for _ in range(processes)
+    ]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    expected = processes * times
+    return {
+        'processes': processes,
+        'expected': expected,
+        'counted': cache.get('shared_counter'),
+        'ops_per_s': round(expected / elapsed, 1),
+    }
+
+
+def compare(names, directory, iterations=1000, value_size=2048,
+            max_entries=100000, processes=4):
+    results = {}
+    for name in names:
+        cache = make_cache(name, directory, max_entries)
+        result = measure(cache, iterations, value_size)
+        if BACKENDS[name][1] and processes:
+            result['shared_incr'] = measure_shared(
+                name, directory, max_entries, processes, iterations
+            )
+        cache.clear()
+        results[name] = result
+    return results
@@ -0,0 +1,142 @@
+"""
+Пропускная способность SQLite при одновременных чтениях и записях: до
+(настройки SQLite по умолчанию) и после (SQLITE_PRAGMAS и таймаут из
+DATABASES). Читатели и писатели — отдельные процессы, как воркеры
+сервера; каждая запись — своя транзакция, как в режиме autocommit
+Django. Считаются задержки, операции в секунду и ошибки «database is
+locked».
+"""
+import multiprocessing
+import os
+import random
+import sqlite3
+import time
+
+from django.conf import settings
+
+from core.db import apply_pragmas
+from .runner import percentiles
+
+# Таймаут модуля sqlite3 по умолчанию.
+STOCK_TIMEOUT = 5.0
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, author_id INTEGER NOT NULL, '
+    'text TEXT NOT NULL, created REAL NOT NULL)',
+    'CREATE INDEX post_created ON post (created, id)',
+)
+READ = (
+    'SELECT id, author_id, substr(text, 1, 500) FROM post '
+    'WHERE created < ? ORDER BY created DESC, id DESC LIMIT 10'
+)
+WRITE = 'INSERT INTO post (author_id, text, created) VALUES (?, ?, ?)'
+TEXT = 'Текст поста для замера. ' * 20
+
+
+def profiles():
+    return {
+        'stock': ({}, STOCK_TIMEOUT),
+        'production': (
+            settings.SQLITE_PRAGMAS,
+            settings.DATABASES['default'].get('OPTIONS', {}).get(
+                'timeout', STOCK_TIMEOUT
+            )
+        ),
+    }
+
+
+def _connect(path, pragmas, timeout):
+    db = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+    apply_pragmas(db.cursor(), pragmas)
+    return db
+
+
+def prepare(path, pragmas, timeout, rows):
+    # Журнал WAL остаётся в файле, поэтому каждый профиль — с чистой базы.
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    db = _connect(path, pragmas, timeout)
+    for statement in SCHEMA:
+        db.execute(statement)
+    now = time.time()
+    db.execute('BEGIN')
+    db.executemany(WRITE, (
+        (index % 100, TEXT, now - index) for index in range(rows)
+    ))
+    db.execute('COMMIT')
+    db.close()
+
+
+def _work(kind, path, pragmas, timeout, operations):
+    db = _connect(path, pragmas, timeout)
+    samples, errors = [], 0
+    start = time.perf_counter()
+    for _ in range(operations):
+        began = time.perf_counter()
+        try:
+            if kind == 'read':
+                db.execute(
+                    READ, (time.time() - random.random() * 3600,)
+                ).fetchall()
+            else:
+                db.execute(WRITE, (random.randrange(100), TEXT, time.time()))
+        except sqlite3.OperationalError:
+            errors += 1
+            continue
+        samples.append((time.perf_counter() - began) * 1000)
+    elapsed = time.perf_counter() - start
+    db.close()
+    return kind, samples, errors, elapsed
+
+
+def _summarize(results, kind):
+    samples, errors, rate = [], 0, 0.0
+    for result_kind, worker_samples, worker_errors, elapsed in results:
+        if result_kind != kind:
+            continue
+        samples.extend(worker_samples)
+        errors += worker_errors
+        rate += len(worker_samples) / elapsed if elapsed else 0
+    if not samples:
+        return {'errors': errors, 'ops_per_s': 0}
+    p50, p95, p99 = percentiles(samples)
+    return {
+        'p50_ms': round(p50, 3),
+        'p95_ms': round(p95, 3),
+        'p99_ms': round(p99, 3),
+        'max_ms': round(max(samples), 3),
+        'ops_per_s': round(rate, 1),
+        'errors': errors,
+    }
+
+
+def measure(path, pragmas, timeout, readers, writers, operations,
+            rows=10000):
+    prepare(path, pragmas, timeout, rows)
+    tasks = [
+        ('read', path, pragmas, timeout, operations)
+    ] * readers + [
+        ('write', path, pragmas, timeout, operations)
+    ] * writers
+    context = multiprocessing.get_context('fork')
+    with context.Pool(len(tasks)) as pool:
+        results = pool.starmap(_work, tasks)
+    return {
+        'read': _summarize(results, 'read'),
+        'write': _summarize(results, 'write'),
+    }
+
+
+def compare(names, directory, readers=4, writers=4, operations=500,
+            rows=10000):
+    available = profiles()
+    results = {}
+    for name in names:
+        pragmas, timeout = available[name]
+        path = os.path.join(directory, f'{name}.sqlite3')
+        results[name] = measure(
+            path, pragmas, timeout, readers, writers, operations, rows
+        )
+        results[name]['pragmas'] = pragmas
+        results[name]['timeout'] = timeout
+    return results
@@ -0,0 +1,78 @@
+import platform
+import shutil
+import tempfile
+from datetime import datetime
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks import caches, runner
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает бэкенды кеша (LocMem, FileBased, SQLite) и сохраняет '
+        'результат в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'backends', nargs='*',
+            help=f'Бэкенды из {", ".join(caches.BACKENDS)}; по умолчанию все.'
+        )
+        parser.add_argument('--iterations', type=int, default=1000)
+        parser.add_argument(
+            '--value-size', type=int, default=2048,
+            help='Размер значения в символах.'
+        )
+        parser.add_argument(
+            '--processes', type=int, default=4,
+            help='Процессов для одновременных incr; 0 — не замерять.'
+        )
+        parser.add_argument(
+            '--directory',
+            help='Где держать файлы кешей; по умолчанию временный каталог.'
+        )
+        parser.add_argument('--output', default='cache-benchmark.json')
+
+    def handle(self, *args, backends, iterations, value_size, processes,
+               directory, output, **options):
+        unknown = set(backends) - set(caches.BACKENDS)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные бэкенды: {", ".join(sorted(unknown))}'
+            )
+        if iterations < 2:
+            raise CommandError('Нужно хотя бы две итерации.')
+        workdir = directory or tempfile.mkdtemp()
+        try:
+            results = caches.compare(
+                backends or list(caches.BACKENDS), workdir, iterations,
+                value_size, processes=processes
+            )
+        finally:
+            if not directory:
+                shutil.rmtree(workdir, ignore_errors=True)
+        meta = {
+            'commit': runner.git_commit(),
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'iterations': iterations,
+            'value_size': value_size,
+        }
+        runner.write_results(output, meta, results)
+        for name, result in results.items():
+            line = '  '.join(
+                f'{operation} {result[operation]["p50_ms"]:.3f} ms'
+                for operation in caches.OPERATIONS
+            )
+            self.stdout.write(f'{name:<10} p50: {line}')
+            shared = result.get('shared_incr')
+            if shared:
+                self.stdout.write(
+                    f'{"":<10} incr из {shared["processes"]} процессов: '
+                    f'{shared["counted"]} из {shared["expected"]}, '
+                    f'{shared["ops_per_s"]:.0f} в секунду'
+                )
+        self.stdout.write(f'Результаты записаны в {output}')
@@ -0,0 +1,79 @@
+import platform
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks import database, runner
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает чтение и запись SQLite с настройками по умолчанию и '
+        'с SQLITE_PRAGMAS и сохраняет результат в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'profiles', nargs='*',
+            help='Профили из stock, production; по умолчанию оба.'
+        )
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument(
+            '--operations', type=int, default=500,
+            help='Операций на каждый процесс.'
+        )
+        parser.add_argument(
+            '--rows', type=int, default=10000,
+            help='Строк в таблице до начала замера.'
+        )
+        parser.add_argument(
+            '--directory',
+            help='Где держать файлы баз; по умолчанию временный каталог.'
+        )
+        parser.add_argument('--output', default='database-benchmark.json')
+
+    def handle(self, *args, profiles, readers, writers, operations, rows,
+               directory, output, **options):
+        unknown = set(profiles) - set(database.profiles())
+        if unknown:
+            raise CommandError(
+                f'Неизвестные профили: {", ".join(sorted(unknown))}'
+            )
+        if operations < 2 or readers + writers < 1:
+            raise CommandError('Нужны процессы и хотя бы две операции.')
+        workdir = directory or tempfile.mkdtemp()
+        try:
+            results = database.compare(
+                profiles or list(database.profiles()), workdir, readers,
+                writers, operations, rows
+            )
+        finally:
+            if not directory:
+                shutil.rmtree(workdir, ignore_errors=True)
+        meta = {
+            'commit': runner.git_commit(),
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'readers': readers,
+            'writers': writers,
+            'operations': operations,
+            'rows': rows,
+        }
+        runner.write_results(output, meta, results)
+        for name, result in results.items():
+            for kind in ('read', 'write'):
+                summary = result[kind]
+                self.stdout.write(
+                    f'{name:<11} {kind:<6} '
+                    f'{summary["ops_per_s"]:>9.0f} в секунду, '
+                    f'p99 {summary.get("p99_ms", 0):.3f} ms, '
+                    f'ошибок {summary["errors"]}'
+                )
+        self.stdout.write(f'Результаты записаны в {output}')
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks import runner
+
+
+class Command(BaseCommand):
+    help = 'Замеряет страницы и записи posts и сохраняет результат в JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'scenarios', nargs='*',
+            help=f'Сценарии из {", ".join(runner.SCENARIOS)}; '
+                 f'по умолчанию все.'
+        )
+        parser.add_argument('--iterations', type=int, default=100)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--alloc-runs', type=int, default=3,
+            help='Отдельные прогоны под tracemalloc для пика памяти.'
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кеш перед каждым запросом.'
+        )
+        parser.add_argument('--output', default='benchmark.json')
+
+    def handle(self, *args, scenarios, iterations, warmup, alloc_runs, cold,
+               output, **options):
+        unknown = set(scenarios) - set(runner.SCENARIOS)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные сценарии: {", ".join(sorted(unknown))}'
+            )
+        if iterations < 1:
+            raise CommandError('Нужна хотя бы одна итерация.')
+        fixtures = runner.Fixtures()
+        missing = fixtures.missing()
+        if missing:
+            raise CommandError(
+                f'В базе нет данных для замеров ({", ".join(missing)}): '
+                f'сначала запустите seed_benchmark.'
+            )
+        bench = runner.Runner(fixtures, iterations, warmup, alloc_runs, cold)
+        results = bench.run(scenarios or runner.SCENARIOS)
+        runner.write_results(output, runner.metadata(bench), results)
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<18} p50 {result["p50_ms"]:>9.2f} ms  '
+                f'p95 {result["p95_ms"]:>9.2f} ms  '
+                f'p99 {result["p99_ms"]:>9.2f} ms  '
+                f'запросов {result["queries"]["median"]:>5}'
+            )
+        self.stdout.write(f'Результаты записаны в {output}')
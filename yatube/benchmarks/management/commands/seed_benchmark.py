@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from benchmarks.seed import Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу пользователями, постами, комментариями и '
+        'подписками для замеров.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--comments', type=int, default=10_000_000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок пользователя.'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, users, groups, posts, comments, follows,
+               batch_size, seed, **options):
+        seeder = Seeder(batch_size, seed, self.stdout)
+        seeder.seed(users, groups, posts, comments, follows)
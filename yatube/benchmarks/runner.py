@@ -0,0 +1,229 @@
+"""
+Замеры страниц и записей posts: задержка (p50/p95/p99), число запросов
+к базе и пик выделенной памяти. Результат — JSON, который можно сравнивать
+между коммитами.
+"""
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+READ_SCENARIOS = (
+    'index', 'group_posts', 'profile', 'post_detail', 'follow_index',
+)
+WRITE_SCENARIOS = (
+    'post_create', 'add_comment', 'profile_follow', 'profile_unfollow',
+)
+SCENARIOS = READ_SCENARIOS + WRITE_SCENARIOS
+
+
+class Fixtures:
+    """Самые тяжёлые для каждой страницы объекты из уже наполненной базы."""
+
+    def __init__(self):
+        self.author = User.objects.order_by('-stats__posts_count').first()
+        self.reader = User.objects.order_by(
+            '-stats__following_count'
+        ).first()
+        self.group = Group.objects.annotate(
+            total=Count('posts')
+        ).order_by('-total').first()
+        self.post = Post.objects.order_by('-comments_count').first()
+        # Автор, на которого читатель ещё не подписан.
+        self.followed = User.objects.exclude(pk=self.reader.pk).exclude(
+            pk__in=Follow.objects.filter(
+                user=self.reader
+            ).values('author_id')
+        ).first() if self.reader else None
+
+    def missing(self):
+        return [name for name, value in vars(self).items() if value is None]
+
+
+class Runner:
+    def __init__(self, fixtures, iterations=100, warmup=5, alloc_runs=3,
+                 cold=False):
+        self.fixtures = fixtures
+        self.iterations = iterations
+        self.warmup = warmup
+        self.alloc_runs = alloc_runs
+        self.cold = cold
+        self.client = Client()
+        self.client.force_login(self.fixtures.reader)
+        self.guest = Client()
+
+    def request(self, name):
+        f = self.fixtures
+        requests = {
+            'index': lambda: self.guest.get(reverse('posts:index')),
+            'group_posts': lambda: self.guest.get(
+                reverse('posts:group_list', args=(f.group.slug,))
+            ),
+            'profile': lambda: self.guest.get(
+                reverse('posts:profile', args=(f.author.username,))
+            ),
+            'post_detail': lambda: self.guest.get(
+                reverse('posts:post_detail', args=(f.post.pk,))
+            ),
+            'follow_index': lambda: self.client.get(
+                reverse('posts:follow_index')
+            ),
+            'post_create': lambda: self.client.post(
+                reverse('posts:post_create'), {'text': 'Замер'}
+            ),
+            'add_comment': lambda: self.client.post(
+                reverse('posts:add_comment', args=(f.post.pk,)),
+                {'text': 'Замер'}
+            ),
+            'profile_follow': lambda: self.client.get(
+                reverse('posts:profile_follow', args=(f.followed.username,))
+            ),
+            'profile_unfollow': lambda: self.client.get(
+                reverse(
+                    'posts:profile_unfollow', args=(f.followed.username,)
+                )
+            ),
+        }
+        return requests[name]()
+
+    def prepare(self, name):
+        # Подписка и отписка замеряются в рабочем, а не холостом состоянии.
+        pair = {
+            'user': self.fixtures.reader, 'author': self.fixtures.followed
+        }
+        if name == 'profile_follow':
+            Follow.objects.filter(**pair).delete()
+        elif name == 'profile_unfollow':
+            Follow.objects.get_or_create(**pair)
+        if self.cold:
+            cache.clear()
+
+    def measure(self, name):
+        self.prepare(name)
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = self.request(name)
+            elapsed = time.perf_counter() - start
+        return elapsed, len(queries), response.status_code
+
+    def allocations(self, name):
+        self.prepare(name)
+        tracemalloc.start()
+        try:
+            self.request(name)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def run(self, names=SCENARIOS):
+        for _ in range(self.warmup):
+            for name in names:
+                self.prepare(name)
+                self.request(name)
+        samples = {name: [] for name in names}
+        for _ in range(self.iterations):
+            for name in names:
+                samples[name].append(self.measure(name))
+        peaks = {name: [] for name in names}
+        for _ in range(self.alloc_runs):
+            for name in names:
+                peaks[name].append(self.allocations(name))
+        return {
+            name: summarize(samples[name], peaks[name]) for name in names
+        }
+
+
+def _percentile(ordered, fraction):
+    # Линейная интерполяция между соседними значениями, как
+    # statistics.quantiles(method='inclusive'), которого нет до Python 3.8.
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (
+        ordered[upper] - ordered[lower]
+    ) * (position - lower)
+
+
+def percentiles(values):
+    if len(values) < 2:
+        return values * 3
+    ordered = sorted(values)
+    return tuple(
+        _percentile(ordered, fraction) for fraction in (0.5, 0.95, 0.99)
+    )
+
+
+def summarize(samples, peaks):
+    latencies = [elapsed * 1000 for elapsed, _, _ in samples]
+    queries = [count for _, count, _ in samples]
+    p50, p95, p99 = percentiles(latencies)
+    return {
+        'p50_ms': round(p50, 3),
+        'p95_ms': round(p95, 3),
+        'p99_ms': round(p99, 3),
+        'mean_ms': round(statistics.mean(latencies), 3),
+        'queries': {
+            'min': min(queries),
+            'median': statistics.median(queries),
+            'max': max(queries),
+        },
+        'alloc_peak_kb': round(max(peaks) / 1024, 1) if peaks else None,
+        'status': sorted({status for _, _, status in samples}),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', 'HEAD'),
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(runner):
+    return {
+        'commit': git_commit(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'debug': settings.DEBUG,
+        'cold_cache': runner.cold,
+        'iterations': runner.iterations,
+        'rows': {
+            'users': User.objects.count(),
+            'groups': Group.objects.count(),
+            'posts': Post.objects.count(),
+            'comments': Comment.objects.count(),
+            'follows': Follow.objects.count(),
+        },
+    }
+
+
+def write_results(path, meta, results):
+    with open(path, 'w') as output:
+        json.dump(
+            {'meta': meta, 'results': results},
+            output,
+            ensure_ascii=False,
+            indent=2
+        )
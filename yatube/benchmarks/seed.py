@@ -0,0 +1,180 @@
+"""
+Наполнение базы данными реалистичного объёма для замеров. Всё пишется
+через bulk_create, поэтому сигналы не срабатывают: счётчики, ленты
+подписок и поисковый индекс достраиваются отдельно в конце.
+"""
+import io
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+
+from posts import search, timeline
+from posts.models import Comment, Follow, Group, Post, User, make_excerpt
+from posts.utils import chunks
+
+USERNAME_PREFIX = 'bench'
+PASSWORD = 'benchmark'
+# Показатель степенного распределения популярности авторов и постов:
+# чем он меньше, тем сильнее выделяются «звёзды».
+POWER_LAW_ALPHA = 1.2
+SENTENCE_POOL = 5000
+# Посты распределены по этому сроку до момента наполнения, комментарии
+# приходят в среднем через COMMENT_DELAY после поста.
+HISTORY = timedelta(days=365)
+COMMENT_DELAY = timedelta(days=1)
+
+
+def _power_law(ranked):
+    """Случайный элемент ranked, первые выпадают гораздо чаще остальных."""
+    index = int(random.paretovariate(POWER_LAW_ALPHA)) - 1
+    return ranked[index % len(ranked)]
+
+
+def _ranked(ids):
+    # Популярность не должна совпадать с порядком id.
+    ranked = list(ids)
+    random.shuffle(ranked)
+    return ranked
+
+
+class Seeder:
+    def __init__(self, batch_size=5000, seed=None, stdout=None):
+        self.batch_size = batch_size
+        self.stdout = stdout or io.StringIO()
+        random.seed(seed)
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(seed)
+        self.sentences = [
+            self.fake.sentence() for _ in range(SENTENCE_POOL)
+        ]
+
+    def log(self, message):
+        self.stdout.write(message)
+
+    def text(self, sentences=3):
+        return ' '.join(random.sample(self.sentences, sentences))
+
+    def bulk_create(self, model, objects, **kwargs):
+        total = 0
+        for chunk in chunks(objects, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(chunk, **kwargs)
+            total += len(chunk)
+        self.log(f'{model.__name__}: {total}')
+
+    def seed(self, users, groups, posts, comments, follows):
+        user_ids = self.create_users(users)
+        group_ids = self.create_groups(groups)
+        self.create_posts(posts, user_ids, group_ids)
+        post_dates = dict(Post.objects.values_list('pk', 'created'))
+        self.create_comments(comments, post_dates, user_ids)
+        self.create_follows(follows, user_ids)
+        self.finish()
+
+    def create_users(self, count):
+        start = User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).count()
+        password = make_password(PASSWORD)
+        self.bulk_create(User, (
+            User(
+                username=f'{USERNAME_PREFIX}{start + i}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password=password
+            )
+            for i in range(count)
+        ))
+        return list(User.objects.values_list('pk', flat=True))
+
+    def create_groups(self, count):
+        start = Group.objects.count()
+        self.bulk_create(Group, (
+            Group(
+                title=self.fake.catch_phrase(),
+                slug=f'{USERNAME_PREFIX}-{start + i}',
+                description=self.text()
+            )
+            for i in range(count)
+        ))
+        return list(Group.objects.values_list('pk', flat=True))
+
+    def create_posts(self, count, user_ids, group_ids):
+        authors = _ranked(user_ids)
+        start = timezone.now() - HISTORY
+        # Даты растут вместе с id, как у постов, написанных по очереди.
+        self.bulk_create(Post, (
+            self._post(
+                authors, group_ids,
+                start + HISTORY * ((i + random.random()) / count)
+            )
+            for i in range(count)
+        ))
+
+    def _post(self, authors, group_ids, created):
+        text = self.text(random.randint(1, 8))
+        return Post(
+            author_id=_power_law(authors),
+            group_id=(
+                random.choice(group_ids)
+                if group_ids and random.random() < 0.7 else None
+            ),
+            text=text,
+            excerpt=make_excerpt(text),
+            created=created
+        )
+
+    def create_comments(self, count, post_dates, user_ids):
+        if not post_dates:
+            return
+        posts = _ranked(post_dates)
+        now = timezone.now()
+        self.bulk_create(Comment, (
+            self._comment(_power_law(posts), post_dates, user_ids, now)
+            for _ in range(count)
+        ))
+
+    def _comment(self, post_id, post_dates, user_ids, now):
+        delay = COMMENT_DELAY * random.expovariate(1)
+        return Comment(
+            post_id=post_id,
+            author_id=random.choice(user_ids),
+            text=self.text(1),
+            created=min(post_dates[post_id] + delay, now)
+        )
+
+    def _follows(self, average, user_ids):
+        authors = _ranked(user_ids)
+        for user_id in user_ids:
+            wanted = random.randint(0, 2 * average)
+            following = set()
+            for _ in range(3 * wanted):
+                if len(following) >= wanted:
+                    break
+                author_id = _power_law(authors)
+                if author_id != user_id:
+                    following.add(author_id)
+            for author_id in following:
+                yield Follow(user_id=user_id, author_id=author_id)
+
+    def create_follows(self, average, user_ids):
+        self.bulk_create(
+            Follow, self._follows(average, user_ids), ignore_conflicts=True
+        )
+
+    def finish(self):
+        call_command(
+            'recount', batch_size=self.batch_size, stdout=self.stdout
+        )
+        self.log(f'TimelineEntry: {timeline.refill(self.batch_size)}')
+        if search.is_supported():
+            call_command(
+                'rebuild_search_index',
+                batch_size=self.batch_size,
+                stdout=self.stdout
+            )
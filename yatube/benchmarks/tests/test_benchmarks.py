@@ -0,0 +1,118 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase
+
+from posts.models import Comment, Follow, Post, TimelineEntry, UserStats
+from ..runner import percentiles
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class BenchmarkTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'seed_benchmark', users=20, groups=2, posts=60, comments=100,
+            follows=3, batch_size=25, seed=1, stdout=StringIO()
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def test_seed_fills_derived_data(self):
+        """Наполнение досчитывает счётчики и ленты подписок."""
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertEqual(UserStats.objects.count(), 20)
+        self.assertEqual(
+            sum(UserStats.objects.values_list('posts_count', flat=True)), 60
+        )
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(TimelineEntry.objects.exists())
+
+    def test_seed_spreads_dates(self):
+        """Даты постов растут с id и растянуты, комментарии — после поста."""
+        dates = list(Post.objects.order_by('pk').values_list(
+            'created', flat=True
+        ))
+        self.assertEqual(dates, sorted(dates))
+        self.assertGreater(dates[-1] - dates[0], timedelta(days=30))
+        self.assertFalse(Comment.objects.filter(
+            created__lt=F('post__created')
+        ).exists())
+
+    def test_run_writes_results(self):
+        """Замер пишет перцентили и число запросов по каждому сценарию."""
+        output = os.path.join(TEMP_DIR, 'benchmark.json')
+        call_command(
+            'run_benchmark', iterations=3, warmup=1, alloc_runs=1,
+            output=output, stdout=StringIO()
+        )
+        with open(output) as results_file:
+            results = json.load(results_file)
+        self.assertEqual(
+            results['meta']['rows']['posts'], Post.objects.count()
+        )
+        for name in ('index', 'follow_index', 'add_comment', 'profile_follow'):
+            with self.subTest(name=name):
+                result = results['results'][name]
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+                self.assertGreater(result['queries']['max'], 0)
+                self.assertIsNotNone(result['alloc_peak_kb'])
+
+
+class PercentilesTest(SimpleTestCase):
+    def test_interpolates_between_values(self):
+        """Перцентили считаются без statistics.quantiles (Python 3.7)."""
+        self.assertEqual(
+            percentiles(list(range(100, 0, -1))), (50.5, 95.05, 99.01)
+        )
+        self.assertEqual(percentiles([7.0]), [7.0, 7.0, 7.0])
+
+
+class CacheBenchmarkTest(SimpleTestCase):
+    def test_compare_backends(self):
+        """Сравнение кешей пишет задержки и проверку общих incr."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        output = os.path.join(directory, 'cache-benchmark.json')
+        call_command(
+            'benchmark_cache', iterations=20, value_size=100, processes=2,
+            output=output, stdout=StringIO()
+        )
+        with open(output) as results_file:
+            results = json.load(results_file)['results']
+        self.assertEqual(set(results), {'locmem', 'filebased', 'sqlite'})
+        self.assertNotIn('shared_incr', results['locmem'])
+        shared = results['sqlite']['shared_incr']
+        self.assertEqual(shared['counted'], shared['expected'])
+
+
+class DatabaseBenchmarkTest(SimpleTestCase):
+    def test_compare_profiles(self):
+        """Замер SQLite пишет чтения и записи для обоих профилей."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        output = os.path.join(directory, 'database-benchmark.json')
+        call_command(
+            'benchmark_database', readers=1, writers=1, operations=20,
+            rows=100, directory=directory, output=output, stdout=StringIO()
+        )
+        with open(output) as results_file:
+            results = json.load(results_file)['results']
+        self.assertEqual(set(results), {'stock', 'production'})
+        for name, result in results.items():
+            with self.subTest(name=name):
+                self.assertEqual(result['write']['errors'], 0)
+                self.assertGreater(result['read']['ops_per_s'], 0)
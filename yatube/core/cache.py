@@ -0,0 +1,126 @@
+"""
+Кеш страниц с поколениями: у каждой области данных (вся лента, группа,
+автор, пост) есть счётчик-версия, который увеличивается при каждой записи
+в эту область. Версии входят в ключ кеша страницы, поэтому запись делает
+старые страницы недостижимыми и TTL может быть сколь угодно длинным.
+Те же версии служат валидатором для условных GET-запросов.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+VERSION_PREFIX = 'version:'
+PAGE_PREFIX = 'page:'
+
+
+def _initial_version():
+    # Версия, пропавшая из кеша, не должна совпасть с прежней.
+    return int(time.time() * 1000)
+
+
+def version_key(scope):
+    # Слаг или имя пользователя в области могут содержать пробелы и
+    # не-ASCII, недопустимые в ключах memcached: в ключ идёт хеш.
+    return VERSION_PREFIX + hashlib.md5(scope.encode()).hexdigest()
+
+
+def get_versions(scopes):
+    keys = [version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = {key: _initial_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def _bump(scopes):
+    for scope in scopes:
+        key = version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), timeout=None)
+
+
+def bump(*scopes):
+    _bump(scopes)
+    # Читатель между записью и COMMIT видит прежние данные, но кладёт их
+    # под новую версию: после COMMIT версии сдвигаются ещё раз.
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(scopes))
+
+
+def page_key(request, versions):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    user = request.user.pk or 0
+    return PAGE_PREFIX + ':'.join(map(str, (path, user, *versions)))
+
+
+def mark_uncacheable(request):
+    """Страница собрана из неготовых данных, и кешировать её нельзя."""
+    if request is not None:
+        request.page_uncacheable = True
+
+
+def page_etag(request, key):
+    # CSRF-кука входит в ETag: страница с формой несёт токен этой куки.
+    csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    return quote_etag(hashlib.md5(f'{key}:{csrf}'.encode()).hexdigest())
+
+
+def _cacheable(request, response):
+    return (
+        response.status_code == 200 and not response.cookies
+        and not getattr(request, 'page_uncacheable', False)
+    )
+
+
+def _add_validators(request, response, etag):
+    response['ETag'] = etag
+    patch_cache_control(
+        response, no_cache=True, private=request.user.is_authenticated
+    )
+    return response
+
+
+def cache_page_versioned(scopes, timeout=None, cache_pages=True):
+    """
+    Кеширует страницу под ключом из адреса, пользователя и версий
+    областей, которые вернёт scopes(request, *args, **kwargs). Из того же
+    ключа получается ETag: пока версии не менялись, клиент получает 304
+    без отрисовки. С cache_pages=False остаётся только ETag.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            versions = get_versions(scopes(request, *args, **kwargs))
+            key = page_key(request, versions)
+            etag = page_etag(request, key)
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return _add_validators(request, not_modified, etag)
+            response = cache.get(key) if cache_pages else None
+            if response is not None:
+                return _add_validators(request, response, etag)
+            response = view(request, *args, **kwargs)
+            if not _cacheable(request, response):
+                return response
+            if cache_pages:
+                cache.set(
+                    key,
+                    response,
+                    settings.PAGE_CACHE_TIMEOUT if timeout is None
+                    else timeout
+                )
+            return _add_validators(request, response, etag)
+        return wrapper
+    return decorator
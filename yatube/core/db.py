@@ -0,0 +1,36 @@
+"""
+Настройка каждого нового соединения с SQLite по SQLITE_PRAGMAS: журнал
+WAL (читатели не ждут писателя), synchronous=NORMAL (без fsync на каждый
+COMMIT, но без потери целостности), ожидание занятой базы вместо
+немедленной ошибки «database is locked», кеш страниц и mmap. Вместе с
+CONN_MAX_AGE всё это выполняется раз на соединение, а не на запрос.
+"""
+import re
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+PRAGMA_NAME = re.compile(r'^[a-z_]+$')
+PRAGMA_VALUE = re.compile(r'^-?\w+$')
+
+
+def apply_pragmas(cursor, pragmas):
+    """Выполняет PRAGMA из словаря; возвращает установленные значения."""
+    applied = {}
+    for name, value in pragmas.items():
+        value = str(value)
+        if not PRAGMA_NAME.match(name) or not PRAGMA_VALUE.match(value):
+            raise ValueError(f'Недопустимая PRAGMA: {name} = {value}')
+        cursor.execute(f'PRAGMA {name} = {value}')
+        row = cursor.fetchone()
+        applied[name] = row[0] if row else value
+    return applied
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRAGMAS:
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, settings.SQLITE_PRAGMAS)
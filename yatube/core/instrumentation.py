@@ -0,0 +1,123 @@
+"""
+Замеры одного запроса: время и число SQL-запросов, время отрисовки
+шаблонов и обращений к кешу, попадания и промахи кеша. Метрики текущего
+запроса лежат в contextvar; пока его не выставил PerformanceMiddleware,
+шаблоны и кеш ничего не считают.
+"""
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.cache.backends import locmem
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+current = ContextVar('request_metrics', default=None)
+MISSING = object()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = defaultdict(float)
+        self.counts = defaultdict(int)
+        self._active = set()
+
+    @contextmanager
+    def timer(self, kind):
+        # Вложенные вызовы (set_many -> set, include внутри шаблона)
+        # не должны учитываться дважды.
+        if kind in self._active:
+            yield False
+            return
+        self._active.add(kind)
+        start = time.perf_counter()
+        try:
+            yield True
+        finally:
+            self.durations[kind] += time.perf_counter() - start
+            self._active.discard(kind)
+
+    @property
+    def total(self):
+        return time.perf_counter() - self.started
+
+
+@contextmanager
+def timer(kind):
+    metrics = current.get()
+    if metrics is None:
+        yield None
+        return
+    with metrics.timer(kind) as outermost:
+        yield metrics if outermost else None
+
+
+def record_sql(execute, sql, params, many, context):
+    with timer('sql') as metrics:
+        if metrics is not None:
+            metrics.counts['sql'] += 1
+        return execute(sql, params, many, context)
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        with timer('template'):
+            return super().render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """DjangoTemplates, который засекает время отрисовки шаблонов."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
+
+
+def _timed(name):
+    def method(self, *args, **kwargs):
+        with timer('cache'):
+            return getattr(super(InstrumentedCacheMixin, self), name)(
+                *args, **kwargs
+            )
+    method.__name__ = name
+    return method
+
+
+class InstrumentedCacheMixin:
+    """Считает попадания, промахи и время обращений к кешу."""
+
+    def get(self, key, default=None, version=None):
+        with timer('cache') as metrics:
+            value = super().get(key, MISSING, version)
+            if metrics is not None:
+                hit = value is not MISSING
+                metrics.counts['cache_hits' if hit else 'cache_misses'] += 1
+        return default if value is MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        with timer('cache') as metrics:
+            values = super().get_many(keys, version)
+            if metrics is not None:
+                metrics.counts['cache_hits'] += len(values)
+                metrics.counts['cache_misses'] += len(keys) - len(values)
+        return values
+
+    add = _timed('add')
+    set = _timed('set')
+    set_many = _timed('set_many')
+    touch = _timed('touch')
+    incr = _timed('incr')
+    delete = _timed('delete')
+    delete_many = _timed('delete_many')
+
+
+class LocMemCache(InstrumentedCacheMixin, locmem.LocMemCache):
+    pass
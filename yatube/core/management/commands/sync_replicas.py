@@ -0,0 +1,59 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from core import routers
+from core.models import Heartbeat
+
+
+class Command(BaseCommand):
+    help = (
+        'Обновляет отметку синхронизации на основной базе и копирует '
+        'её в реплики SQLite; показывает отставание реплик.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'replicas', nargs='*',
+            help='Псевдонимы из REPLICA_DATABASES; по умолчанию все.'
+        )
+        parser.add_argument(
+            '--heartbeat-only', action='store_true',
+            help='Только отметка: реплики копирует сама база.'
+        )
+
+    def handle(self, *args, replicas, heartbeat_only, **options):
+        unknown = set(replicas) - set(settings.REPLICA_DATABASES)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные реплики: {", ".join(sorted(unknown))}'
+            )
+        Heartbeat.objects.update_or_create(
+            pk=1, defaults={'written': timezone.now()}
+        )
+        for alias in replicas or settings.REPLICA_DATABASES:
+            if heartbeat_only:
+                continue
+            if connections[alias].vendor != 'sqlite':
+                self.stderr.write(f'{alias}: не SQLite, пропущена.')
+                continue
+            self.copy(alias)
+        routers.forget_positions()
+        for alias, lag in routers.replica_lags().items():
+            state = 'недоступна' if lag is None else f'отставание {lag:.1f} с'
+            self.stdout.write(f'{alias}: {state}')
+
+    def copy(self, alias):
+        primary = connections['default']
+        primary.ensure_connection()
+        target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+        try:
+            primary.connection.backup(target)
+        finally:
+            target.close()
+        # Соединение процесса с репликой откроется заново на новой копии.
+        connections[alias].close()
+        self.stdout.write(f'{alias}: скопирована')
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.warmup import warm_templates
+
+
+class Command(BaseCommand):
+    help = (
+        'Разбирает все шаблоны проекта: проверка перед выкладкой и замер '
+        'прогрева, который выполняет каждый процесс при старте.'
+    )
+
+    def handle(self, *args, **options):
+        result = warm_templates()
+        for name, error in result['errors'].items():
+            self.stderr.write(f'{name}: {error}')
+        self.stdout.write(
+            f'Разобрано шаблонов: {result["templates"]} '
+            f'за {result["duration_ms"]} мс'
+        )
+        if result['errors']:
+            raise CommandError('В шаблонах есть ошибки.')
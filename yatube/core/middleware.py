@@ -0,0 +1,188 @@
+"""
+Замеры каждого запроса в заголовке Server-Timing и, по желанию, в журнале
+core.performance. PerformanceMiddleware стоит в начале MIDDLEWARE,
+ViewTimingMiddleware — последним: между ними обработчик, разбор адреса
+и отрисовка ответа. С PERFORMANCE_TIMING = False оба выключаются целиком.
+ReplicaPinMiddleware закрепляет за основной базой сессию после записи.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .instrumentation import RequestMetrics, current, record_sql, timer
+from .warmup import last_warmup
+
+logger = logging.getLogger('core.performance')
+
+
+class ViewStats:
+    """Суммы метрик по обработчикам в пределах процесса."""
+
+    FIELDS = ('total', 'view', 'sql', 'template', 'cache')
+    COUNTS = ('sql', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, metrics):
+        with self._lock:
+            stats = self._views.setdefault(view, {
+                'requests': 0,
+                'max_ms': 0.0,
+                **{f'{field}_ms': 0.0 for field in self.FIELDS},
+                **{f'{count}_count': 0 for count in self.COUNTS},
+            })
+            stats['requests'] += 1
+            stats['max_ms'] = max(stats['max_ms'], metrics['total_ms'])
+            for field in self.FIELDS:
+                stats[f'{field}_ms'] += metrics[f'{field}_ms']
+            for count in self.COUNTS:
+                stats[f'{count}_count'] += metrics[f'{count}_count']
+
+    def snapshot(self):
+        with self._lock:
+            views = {view: dict(stats) for view, stats in self._views.items()}
+        for stats in views.values():
+            for field in self.FIELDS:
+                stats[f'{field}_avg_ms'] = round(
+                    stats[f'{field}_ms'] / stats['requests'], 3
+                )
+        return views
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+
+
+view_stats = ViewStats()
+first_request = {}
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def server_timing(metrics):
+    return ', '.join((
+        f'sql;dur={metrics["sql_ms"]};desc="{metrics["sql_count"]} queries"',
+        f'template;dur={metrics["template_ms"]}',
+        f'cache;dur={metrics["cache_ms"]};desc="{metrics["cache_hits_count"]}'
+        f' hits / {metrics["cache_misses_count"]} misses"',
+        f'view;dur={metrics["view_ms"]}',
+        f'total;dur={metrics["total_ms"]}',
+    ))
+
+
+class PerformanceMiddleware:
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(record_sql)
+                    )
+                response = self.get_response(request)
+        finally:
+            current.reset(token)
+        summary = {
+            'total_ms': _ms(metrics.total),
+            **{
+                f'{kind}_ms': _ms(metrics.durations[kind])
+                for kind in ('view', 'sql', 'template', 'cache')
+            },
+            **{
+                f'{count}_count': metrics.counts[count]
+                for count in ViewStats.COUNTS
+            },
+        }
+        match = request.resolver_match
+        view = match.view_name if match else str(response.status_code)
+        view_stats.record(view, summary)
+        response['Server-Timing'] = server_timing(summary)
+        if settings.PERFORMANCE_LOG:
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'view': view,
+                'status': response.status_code,
+                **summary,
+            }))
+        return response
+
+
+class ViewTimingMiddleware:
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with timer('view'):
+            return self.get_response(request)
+
+
+class ReplicaPinMiddleware:
+    """
+    После запроса, который мог писать, сессия на время читает только
+    основную базу (core.routers): реплика может ещё не получить запись.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax'
+            )
+        return response
+
+
+class FirstRequestMiddleware:
+    """
+    Засекает первый запрос процесса: он платит за ленивую инициализацию
+    (соединение с базой, шаблоны без прогрева) и пишется в журнал всегда.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.pending = not first_request
+
+    def __call__(self, request):
+        if not self.pending:
+            return self.get_response(request)
+        self.pending = False
+        start = time.perf_counter()
+        response = self.get_response(request)
+        first_request.update(
+            pid=os.getpid(),
+            path=request.path,
+            status=response.status_code,
+            total_ms=_ms(time.perf_counter() - start),
+            templates_warmed=last_warmup.get('templates', 0),
+            warmup_ms=last_warmup.get('duration_ms'),
+        )
+        logger.info(json.dumps({'event': 'first_request', **first_request}))
+        return response
@@ -1,12 +1,37 @@
 from django.db import models
 
 
+class CreatedField(models.DateTimeField):
+    """
+    Как auto_now_add, но дату, заданную объекту явно (например, при
+    импорте), не перезаписывает.
+    """
+
+    def pre_save(self, model_instance, add):
+        value = getattr(model_instance, self.attname)
+        if add and value is not None:
+            return value
+        return super().pre_save(model_instance, add)
+
+
 class CreatedModel(models.Model):
     """Абстрактная модель."""
-    created = models.DateTimeField(
+    created = CreatedField(
         verbose_name='Дата создания',
         auto_now_add=True
     )
 
     class Meta:
         abstract = True
+
+
+class Heartbeat(models.Model):
+    """
+    Одна строка со временем последней синхронизации реплик: на реплике
+    она показывает, до какого момента та догнала основную базу.
+    """
+    written = models.DateTimeField('Записано')
+
+    class Meta:
+        verbose_name = 'Отметка синхронизации'
+        verbose_name_plural = 'Отметки синхронизации'
@@ -0,0 +1,160 @@
+"""
+Чтение с реплик (REPLICA_DATABASES). С реплики читают только
+представления, отмеченные replica_reads; запись и всё остальное идут в
+default. Сессия, которая только что писала, какое-то время читает тоже
+из default (кука REPLICA_PIN_COOKIE на REPLICA_PIN_SECONDS), чтобы автор
+сразу видел свой пост.
+
+Отставание реплики считается по строке Heartbeat: её время обновляет на
+основной базе команда sync_replicas, а время последней зафиксированной
+записи хранится в кеше. Реплика, на которой есть все записи, не отстаёт;
+иначе отставание — время с её синхронизации. Реплика, отставшая больше
+чем на REPLICA_MAX_LAG секунд или недоступная, пропускается. Реплика
+выбирается один раз на запрос, и все его чтения видят один снимок.
+Страница, прочитанная с отстающей реплики, не кешируется: иначе
+устаревшая отрисовка легла бы в кеш под новыми версиями областей.
+"""
+import random
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+
+from .cache import mark_uncacheable
+
+LAST_WRITE_KEY = 'replica:last-write'
+PRIMARY = 'default'
+HEARTBEAT = 'core.heartbeat'
+
+reading = ContextVar('replica_reading', default=None)
+
+_positions = {}
+_positions_lock = threading.Lock()
+
+
+class ReplicaReads:
+    """Состояние одного запроса, которому разрешено читать с реплик."""
+
+    def __init__(self):
+        self.alias = None
+        self.stale = False
+
+    def choose(self):
+        """База для всех чтений запроса; выбирается при первом чтении."""
+        if self.alias is None:
+            fresh = [
+                (alias, lag) for alias, lag in replica_lags().items()
+                if lag is not None and lag <= settings.REPLICA_MAX_LAG
+            ]
+            if fresh:
+                self.alias, lag = random.choice(fresh)
+                self.stale = bool(lag)
+            else:
+                self.alias = PRIMARY
+        return self.alias
+
+
+def last_write():
+    return cache.get(LAST_WRITE_KEY, 0)
+
+
+def record_write():
+    cache.set(LAST_WRITE_KEY, time.time(), None)
+
+
+def _read_position(alias):
+    from .models import Heartbeat
+    try:
+        written = Heartbeat.objects.using(alias).values_list(
+            'written', flat=True
+        ).first()
+    except DatabaseError:
+        return None
+    return written.timestamp() if written else None
+
+
+def replica_position(alias):
+    """Время последней синхронизации реплики; None — реплика недоступна."""
+    now = time.monotonic()
+    with _positions_lock:
+        cached = _positions.get(alias)
+    if cached and now - cached[1] < settings.REPLICA_CHECK_INTERVAL:
+        return cached[0]
+    position = _read_position(alias)
+    with _positions_lock:
+        _positions[alias] = (position, now)
+    return position
+
+
+def forget_positions():
+    with _positions_lock:
+        _positions.clear()
+
+
+def replica_lags():
+    """Отставание каждой реплики в секундах; None — недоступна."""
+    written = last_write()
+    now = time.time()
+    lags = {}
+    for alias in settings.REPLICA_DATABASES:
+        position = replica_position(alias)
+        if position is None:
+            lags[alias] = None
+        else:
+            lags[alias] = 0 if written <= position else now - position
+    return lags
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = reading.get()
+        if state is None or not settings.REPLICA_DATABASES:
+            return None
+        return state.choose()
+
+    def db_for_write(self, model, **hints):
+        # Отметка синхронизации сама по себе не делает реплики отставшими.
+        heartbeat = model._meta.label_lower == HEARTBEAT
+        if settings.REPLICA_DATABASES and not heartbeat:
+            # Запись видна другим только после COMMIT, а откаченная не
+            # видна вовсе; вне транзакции отметка ставится сразу.
+            transaction.on_commit(record_write, using=PRIMARY)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии default: объекты с них связываются свободно.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.REPLICA_DATABASES
+
+
+def pinned(request):
+    return settings.REPLICA_PIN_COOKIE in request.COOKIES
+
+
+def replica_reads(view):
+    """Представление только читает, и без закрепления — с реплики."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (not settings.REPLICA_DATABASES or pinned(request)
+                or request.method not in ('GET', 'HEAD')):
+            return view(request, *args, **kwargs)
+        state = ReplicaReads()
+        token = reading.set(state)
+        try:
+            response = view(request, *args, **kwargs)
+            # Ответ-шаблон (TemplateView) отрисовывается здесь же, пока
+            # чтение с реплик ещё разрешено.
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+        finally:
+            reading.reset(token)
+        if state.stale:
+            mark_uncacheable(request)
+        return response
+    return wrapper
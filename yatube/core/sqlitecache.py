@@ -0,0 +1,295 @@
+"""
+Кеш в файле SQLite в режиме WAL: один на машину и общий для всех её
+процессов, без отдельного сервиса. Число записей (MAX_ENTRIES) и их
+суммарный размер в байтах (MAX_SIZE) ограничены, лишнее вытесняется по
+давности последнего чтения (LRU). Значения больше COMPRESS_MIN_SIZE байт
+сжимаются zlib. Целые числа хранятся как INTEGER, и incr атомарен между
+процессами: чтение и запись идут в одной транзакции BEGIN IMMEDIATE.
+Счётчики записей и байтов ведут триггеры, поэтому проверка лимитов
+не пересчитывает таблицу.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .instrumentation import InstrumentedCacheMixin
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT NOT NULL UNIQUE, value BLOB NOT NULL, '
+    'compressed INTEGER NOT NULL, size INTEGER NOT NULL, '
+    'expires REAL, accessed REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+    'CREATE TABLE IF NOT EXISTS cache_stats ('
+    'id INTEGER PRIMARY KEY CHECK (id = 1), '
+    'entries INTEGER NOT NULL, bytes INTEGER NOT NULL)',
+    'INSERT OR IGNORE INTO cache_stats VALUES (1, 0, 0)',
+    'CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN '
+    'UPDATE cache_stats SET entries = entries + 1, bytes = bytes + NEW.size;'
+    ' END',
+    'CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN '
+    'UPDATE cache_stats SET entries = entries - 1, bytes = bytes - OLD.size;'
+    ' END',
+    'CREATE TRIGGER IF NOT EXISTS cache_resize AFTER UPDATE OF size ON cache '
+    'BEGIN UPDATE cache_stats SET bytes = bytes - OLD.size + NEW.size; END',
+)
+UPSERT = (
+    'INSERT INTO cache (key, value, compressed, size, expires, accessed) '
+    'VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+    'value = excluded.value, compressed = excluded.compressed, '
+    'size = excluded.size, expires = excluded.expires, '
+    'accessed = excluded.accessed'
+)
+# add() заменяет только просроченную запись.
+ADD = UPSERT + (
+    ' WHERE cache.expires IS NOT NULL AND cache.expires <= excluded.accessed'
+)
+# Время чтения обновляется не чаще раза в столько секунд: каждое чтение
+# не должно становиться записью.
+ACCESS_RESOLUTION = 1.0
+# Не больше стольких параметров в одном запросе SQLite.
+MAX_PARAMS = 900
+INT_SIZE = 8
+
+
+def _chunks(items, size=MAX_PARAMS):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _placeholders(items):
+    return ', '.join('?' * len(items))
+
+
+@contextmanager
+def _write(db):
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        yield
+    except BaseException:
+        db.execute('ROLLBACK')
+        raise
+    db.execute('COMMIT')
+
+
+class BaseSQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size = int(options.get('MAX_SIZE', 0))
+        self._compress_min_size = int(options.get('COMPRESS_MIN_SIZE', 1024))
+        self._compress_level = int(options.get('COMPRESS_LEVEL', 6))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        # Своё соединение у каждого потока; после fork соединение
+        # родителя использовать нельзя.
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = self._connect()
+            local.pid = os.getpid()
+        return local.connection
+
+    def _connect(self):
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(
+            self._path,
+            timeout=self._busy_timeout,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        with _write(db):
+            for statement in SCHEMA:
+                db.execute(statement)
+        return db
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _encode(self, value):
+        if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+            return value, 0, INT_SIZE
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if self._compress_min_size and len(data) >= self._compress_min_size:
+            packed = zlib.compress(data, self._compress_level)
+            if len(packed) < len(data):
+                return packed, 1, len(packed)
+        return data, 0, len(data)
+
+    def _decode(self, value, compressed):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(zlib.decompress(value) if compressed else value)
+
+    def _fetch(self, keys, now):
+        """Живые записи по ключам; время чтения продлевает им жизнь в LRU."""
+        found, stale = {}, []
+        db = self._db
+        for chunk in _chunks(keys):
+            for key, value, compressed, expires, accessed in db.execute(
+                'SELECT key, value, compressed, expires, accessed FROM cache '
+                f'WHERE key IN ({_placeholders(chunk)})', chunk
+            ):
+                if expires is not None and expires <= now:
+                    continue
+                found[key] = self._decode(value, compressed)
+                if now - accessed > ACCESS_RESOLUTION:
+                    stale.append(key)
+        if stale:
+            self._mark_accessed(stale, now)
+        return found
+
+    def _mark_accessed(self, keys, now):
+        # Отметка для LRU не стоит ожидания занятой базы: на время её
+        # записи ожидание блокировки отключается.
+        db = self._db
+        db.execute('PRAGMA busy_timeout = 0')
+        try:
+            for chunk in _chunks(keys, MAX_PARAMS - 1):
+                db.execute(
+                    'UPDATE cache SET accessed = ? '
+                    f'WHERE key IN ({_placeholders(chunk)})', (now, *chunk)
+                )
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            db.execute(
+                f'PRAGMA busy_timeout = {int(self._busy_timeout * 1000)}'
+            )
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._fetch([key], time.time()).get(key, default)
+
+    def get_many(self, keys, version=None):
+        made = {self._key(key, version): key for key in keys}
+        found = self._fetch(list(made), time.time())
+        return {made[key]: value for key, value in found.items()}
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._db.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)', (key, time.time())
+        ).fetchone() is not None
+
+    def _rows(self, items, timeout, now):
+        expires = self.get_backend_timeout(timeout)
+        return [
+            (key, *self._encode(value), expires, now) for key, value in items
+        ]
+
+    def _over_limit(self, db):
+        entries, size = db.execute(
+            'SELECT entries, bytes FROM cache_stats'
+        ).fetchone()
+        over = entries > self._max_entries or (
+            self._max_size and size > self._max_size
+        )
+        return entries if over else 0
+
+    def _cull(self, db, now):
+        if not self._over_limit(db):
+            return
+        if self._cull_frequency == 0:
+            db.execute('DELETE FROM cache')
+            return
+        db.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        entries = self._over_limit(db)
+        while entries:
+            db.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY accessed LIMIT ?)',
+                (max(entries // self._cull_frequency, 1),)
+            )
+            entries = self._over_limit(db)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        rows = self._rows(
+            ((self._key(key, version), value) for key, value in data.items()),
+            timeout,
+            now
+        )
+        db = self._db
+        with _write(db):
+            db.executemany(UPSERT, rows)
+            self._cull(db, now)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        [row] = self._rows([(self._key(key, version), value)], timeout, now)
+        db = self._db
+        with _write(db):
+            added = db.execute(ADD, row).rowcount > 0
+            if added:
+                self._cull(db, now)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        db = self._db
+        with _write(db):
+            row = db.execute(
+                'SELECT value, compressed FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)', (key, time.time())
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = self._decode(*row) + delta
+            data, compressed, size = self._encode(value)
+            db.execute(
+                'UPDATE cache SET value = ?, compressed = ?, size = ? '
+                'WHERE key = ?', (data, compressed, size, key)
+            )
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        return self._db.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time())
+        ).rowcount > 0
+
+    def delete(self, key, version=None):
+        return self._db.execute(
+            'DELETE FROM cache WHERE key = ?', (self._key(key, version),)
+        ).rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        db = self._db
+        with _write(db):
+            for chunk in _chunks(keys):
+                db.execute(
+                    f'DELETE FROM cache WHERE key IN ({_placeholders(chunk)})',
+                    chunk
+                )
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+
+class SQLiteCache(InstrumentedCacheMixin, BaseSQLiteCache):
+    pass
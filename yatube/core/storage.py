@@ -0,0 +1,123 @@
+"""
+Хранилище с адресацией по содержимому: файл лежит под своим SHA-256,
+поэтому одинаковые загрузки занимают место на диске один раз. Повторное
+использование файла и его удаление (posts.images) идут под общей
+блокировкой lock(), а сохранение обновляет время изменения файла: так
+удаление видит загрузку, чей пост ещё не зафиксирован в базе.
+"""
+import fcntl
+import hashlib
+import io
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+from PIL import Image, ImageOps
+
+
+LOCK_NAME = '.storage.lock'
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    @contextmanager
+    def lock(self):
+        """Блокировка хранилища, общая для всех процессов машины."""
+        os.makedirs(self.location, exist_ok=True)
+        with open(os.path.join(self.location, LOCK_NAME), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def saved_within(self, name, seconds):
+        """Файл сохраняли (или переиспользовали) не раньше seconds назад."""
+        try:
+            return time.time() - os.path.getmtime(self.path(name)) < seconds
+        except OSError:
+            return False
+
+    def get_available_name(self, name, max_length=None):
+        # Имя всё равно заменяется хешем в _save().
+        return name
+
+    def _save(self, name, content):
+        directory = self.path(os.path.dirname(name))
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.upload')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            hexdigest = digest.hexdigest()
+            name = os.path.join(
+                os.path.dirname(name),
+                hexdigest[:2],
+                hexdigest + os.path.splitext(name)[1].lower()
+            )
+            full_path = self.path(name)
+            with self.lock():
+                if os.path.exists(full_path):
+                    # Свежее время изменения удерживает файл от удаления,
+                    # пока пост с ним не зафиксирован.
+                    os.utime(full_path)
+                    return name
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(tmp_path, self.file_permissions_mode)
+                os.replace(tmp_path, full_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return name
+
+
+@deconstructible
+class NormalizedImageStorage(ContentAddressedStorage):
+    """
+    Перед сохранением уменьшает картинку до IMAGE_MAX_SIZE, поворачивает
+    по EXIF, отбрасывает метаданные и пережимает в JPEG (PNG, если есть
+    прозрачность). Анимированные картинки сохраняются как есть.
+    """
+
+    def _save(self, name, content):
+        normalized = self.normalize(content)
+        if normalized is not None:
+            root = os.path.splitext(name)[0]
+            name, content = root + normalized[0], normalized[1]
+        return super()._save(name, content)
+
+    def normalize(self, content):
+        content.seek(0)
+        try:
+            image = Image.open(content)
+            if getattr(image, 'is_animated', False):
+                return None
+            image = ImageOps.exif_transpose(image)
+        except (OSError, SyntaxError):
+            return None
+        image.thumbnail(settings.IMAGE_MAX_SIZE)
+        output = io.BytesIO()
+        if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+            image.save(output, 'PNG', optimize=True)
+            extension = '.png'
+        else:
+            image.convert('RGB').save(
+                output,
+                'JPEG',
+                quality=settings.IMAGE_QUALITY,
+                optimize=True,
+                progressive=True
+            )
+            extension = '.jpg'
+        return extension, ContentFile(output.getvalue())
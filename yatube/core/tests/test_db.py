@@ -0,0 +1,35 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from django.conf import settings
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from ..db import apply_pragmas
+
+
+class SQLitePragmasTest(TestCase):
+    def test_connection_configured(self):
+        """Новое соединение получает PRAGMA из SQLITE_PRAGMAS."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(
+                cursor.fetchone()[0], settings.SQLITE_PRAGMAS['cache_size']
+            )
+
+
+class ApplyPragmasTest(SimpleTestCase):
+    def test_wal_on_file_database(self):
+        """Файловая база переходит в WAL; чужие строки не выполняются."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        db = sqlite3.connect(os.path.join(directory, 'test.sqlite3'))
+        self.addCleanup(db.close)
+        applied = apply_pragmas(db.cursor(), settings.SQLITE_PRAGMAS)
+        self.assertEqual(applied['journal_mode'], 'wal')
+        with self.assertRaises(ValueError):
+            apply_pragmas(db.cursor(), {'synchronous': 'OFF; DROP TABLE x'})
@@ -0,0 +1,96 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+from ..middleware import view_stats
+
+User = get_user_model()
+
+
+def timing(response):
+    """Метрики из заголовка Server-Timing: имя -> {'dur': ..., 'desc': ...}."""
+    metrics = {}
+    for entry in response['Server-Timing'].split(', '):
+        name, *params = entry.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+@override_settings(PERFORMANCE_TIMING=True)
+class PerformanceMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        Post.objects.create(author=cls.user, text='Тестовый текст')
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+        view_stats.clear()
+
+    def test_server_timing_on_every_app(self):
+        """Заголовок Server-Timing есть у страниц всех приложений и ошибок."""
+        urls = [
+            reverse('posts:index'),
+            reverse('about:author'),
+            reverse('users:signup'),
+            reverse('admin:login'),
+            '/unexisting_page/',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                metrics = timing(self.client.get(url))
+                self.assertEqual(
+                    set(metrics), {'sql', 'template', 'cache', 'view', 'total'}
+                )
+                self.assertGreater(float(metrics['template']['dur']), 0)
+                self.assertLessEqual(
+                    float(metrics['view']['dur']),
+                    float(metrics['total']['dur'])
+                )
+
+    def test_sql_and_cache_counted(self):
+        """Считаются запросы к базе, попадания и промахи кеша."""
+        metrics = timing(self.client.get(reverse('posts:index')))
+        self.assertNotEqual(metrics['sql']['desc'], '"0 queries"')
+        self.assertIn('0 hits', metrics['cache']['desc'])
+        metrics = timing(self.client.get(reverse('posts:index')))
+        self.assertEqual(metrics['sql']['desc'], '"0 queries"')
+        self.assertNotIn('0 hits', metrics['cache']['desc'])
+
+    def test_per_view_aggregation(self):
+        """Метрики суммируются по обработчикам."""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        self.client.get('/unexisting_page/')
+        stats = view_stats.snapshot()
+        self.assertEqual(stats['posts:index']['requests'], 2)
+        self.assertEqual(stats['404']['requests'], 1)
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse('performance_stats'))
+        self.assertEqual(
+            response.json()['views']['posts:index']['requests'], 2
+        )
+
+    @override_settings(PERFORMANCE_LOG=True)
+    def test_structured_log(self):
+        """С PERFORMANCE_LOG каждый запрос пишется в журнал строкой JSON."""
+        with self.assertLogs('core.performance', 'INFO') as logs:
+            self.client.get(reverse('posts:index'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['sql_count'], 0)
+
+    @override_settings(PERFORMANCE_TIMING=False)
+    def test_disabled(self):
+        """Выключенные замеры не добавляют заголовок и не копят метрики."""
+        response = Client().get(reverse('posts:index'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(view_stats.snapshot(), {})
@@ -0,0 +1,110 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import routers
+from ..models import Heartbeat
+
+User = get_user_model()
+
+
+@override_settings(REPLICA_DATABASES=['replica'], REPLICA_MAX_LAG=5)
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = routers.ReplicaRouter()
+
+    def read(self, position):
+        state = routers.ReplicaReads()
+        token = routers.reading.set(state)
+        try:
+            with mock.patch.object(
+                routers, 'replica_position', return_value=position
+            ):
+                return self.router.db_for_read(User), state.stale
+        finally:
+            routers.reading.reset(token)
+
+    def write(self, model):
+        """Запись с немедленным COMMIT: тест сам идёт в транзакции."""
+        with mock.patch.object(
+            routers.transaction, 'on_commit',
+            side_effect=lambda func, using=None: func()
+        ):
+            return self.router.db_for_write(model)
+
+    def test_reads_only_marked_views(self):
+        """Без replica_reads чтение и запись идут в основную базу."""
+        self.assertIsNone(self.router.db_for_read(User))
+        self.assertEqual(self.router.db_for_write(User), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+
+    def test_replica_lag(self):
+        """Отставшая реплика читается без кеша, далеко отставшая — нет."""
+        now = time.time()
+        self.write(User)
+        self.assertEqual(self.read(now + 1), ('replica', False))
+        self.assertEqual(self.read(now - 1), ('replica', True))
+        self.assertEqual(self.read(now - 60), ('default', False))
+        self.assertEqual(self.read(None), ('default', False))
+
+    def test_heartbeat_write_is_not_data(self):
+        """Отметка синхронизации не делает реплики отставшими."""
+        self.write(Heartbeat)
+        self.assertEqual(routers.last_write(), 0)
+
+    def test_write_counts_after_commit(self):
+        """Время записи отмечается при фиксации транзакции, а не раньше."""
+        with mock.patch.object(routers.transaction, 'on_commit') as commit:
+            self.router.db_for_write(User)
+        self.assertEqual(routers.last_write(), 0)
+        [(callback,), _] = commit.call_args
+        callback()
+        self.assertGreater(routers.last_write(), 0)
+
+    def test_replica_chosen_once_per_request(self):
+        """Все чтения запроса идут в одну базу с одной проверкой."""
+        state = routers.ReplicaReads()
+        token = routers.reading.set(state)
+        try:
+            with mock.patch.object(
+                routers, 'replica_lags', return_value={'replica': 0}
+            ) as lags:
+                self.assertEqual(self.router.db_for_read(User), 'replica')
+                self.assertEqual(self.router.db_for_read(User), 'replica')
+        finally:
+            routers.reading.reset(token)
+        self.assertEqual(lags.call_count, 1)
+
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReplicaPinTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    @mock.patch.object(routers, 'replica_lags', return_value={})
+    def test_write_pins_session_to_primary(self, lags):
+        """После записи сессия читает только основную базу."""
+        self.client.get(reverse('posts:index'))
+        self.assertTrue(lags.called)
+        response = self.client.post(
+            reverse('posts:profile_follow', kwargs={'username': 'author'})
+        )
+        pin = response.cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertEqual(pin['max-age'], settings.REPLICA_PIN_SECONDS)
+        lags.reset_mock()
+        self.client.get(reverse('posts:profile', kwargs={'username': 'auth'}))
+        self.assertFalse(lags.called)
@@ -0,0 +1,121 @@
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..sqlitecache import SQLiteCache
+
+
+def increment(path, times):
+    cache = SQLiteCache(path, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def stored(self, cache, key):
+        return cache._db.execute(
+            'SELECT compressed, size FROM cache WHERE key = ?',
+            (cache.make_key(key),)
+        ).fetchone()
+
+    def test_shared_between_instances(self):
+        """Запись одного экземпляра видна другому, как соседнему воркеру."""
+        writer, reader = self.make_cache(), self.make_cache()
+        writer.set('key', {'value': [1, 2]})
+        writer.set_many({'a': 1, 'b': 'два'})
+        self.assertEqual(reader.get('key'), {'value': [1, 2]})
+        self.assertEqual(
+            reader.get_many(['a', 'b', 'missing']), {'a': 1, 'b': 'два'}
+        )
+        self.assertFalse(reader.add('a', 5))
+        reader.delete('key')
+        self.assertIsNone(writer.get('key'))
+
+    def test_expiry(self):
+        """Просроченная запись не читается и уступает место add()."""
+        cache = self.make_cache()
+        cache.set('key', 'old', timeout=0)
+        self.assertIsNone(cache.get('key'))
+        self.assertFalse(cache.has_key('key'))
+        self.assertTrue(cache.add('key', 'new'))
+        self.assertEqual(cache.get('key'), 'new')
+        self.assertTrue(cache.touch('key', 100))
+
+    def test_incr_is_atomic_across_processes(self):
+        """Одновременные incr из нескольких процессов не теряются."""
+        cache = self.make_cache()
+        cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=increment, args=(self.path, 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(cache.get('counter'), 200)
+        self.assertEqual(cache.decr('counter', 100), 100)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+
+    @mock.patch('core.sqlitecache.ACCESS_RESOLUTION', 0)
+    def test_lru_eviction(self):
+        """Сверх MAX_ENTRIES вытесняются давно не читанные записи."""
+        cache = self.make_cache(MAX_ENTRIES=3, CULL_FREQUENCY=3)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+        cache.get('a')
+        cache.set('d', 'd')
+        self.assertEqual(
+            set(cache.get_many(['a', 'b', 'c', 'd'])), {'a', 'c', 'd'}
+        )
+
+    @mock.patch('core.sqlitecache.ACCESS_RESOLUTION', 0)
+    def test_read_does_not_wait_for_writer(self):
+        """Чтение не ждёт чужой записи ради отметки LRU."""
+        cache = self.make_cache(BUSY_TIMEOUT=5)
+        cache.set('key', 'value')
+        writer = sqlite3.connect(self.path, isolation_level=None)
+        self.addCleanup(writer.close)
+        writer.execute('BEGIN IMMEDIATE')
+        try:
+            start = time.monotonic()
+            self.assertEqual(cache.get('key'), 'value')
+            self.assertLess(time.monotonic() - start, 1)
+        finally:
+            writer.execute('ROLLBACK')
+        self.assertEqual(
+            cache._db.execute('PRAGMA busy_timeout').fetchone(), (5000,)
+        )
+
+    def test_size_limit_and_compression(self):
+        """Большие значения сжимаются, суммарный размер ограничен."""
+        cache = self.make_cache(MAX_SIZE=4000, COMPRESS_MIN_SIZE=100)
+        cache.set('text', 'x' * 10000)
+        compressed, size = self.stored(cache, 'text')
+        self.assertEqual(compressed, 1)
+        self.assertLess(size, 1000)
+        self.assertEqual(cache.get('text'), 'x' * 10000)
+        for index in range(10):
+            cache.set(f'random{index}', os.urandom(1000))
+        entries, total = cache._db.execute(
+            'SELECT entries, bytes FROM cache_stats'
+        ).fetchone()
+        self.assertLessEqual(total, 4000)
+        self.assertGreater(entries, 0)
+        self.assertIsNotNone(cache.get('random9'))
@@ -0,0 +1,62 @@
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.template import engines
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import middleware
+from ..warmup import warm_templates
+
+CACHED_TEMPLATES = [{
+    **settings.TEMPLATES[0],
+    'OPTIONS': {
+        **settings.TEMPLATES[0]['OPTIONS'],
+        'loaders': [(
+            'django.template.loaders.cached.Loader',
+            [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]
+        )],
+    },
+}]
+
+
+class WarmupTest(TestCase):
+    @override_settings(TEMPLATES=CACHED_TEMPLATES)
+    def test_warmup_fills_cached_loader(self):
+        """Прогрев кладёт в cached.Loader все шаблоны проекта."""
+        result = warm_templates()
+        self.assertEqual(result['errors'], {})
+        engine = engines.all()[0].engine
+        cached = engine.template_loaders[0].get_template_cache
+        for name in (
+            'base.html',
+            'includes/header.html',
+            'posts/includes/post_list.html',
+            'core/404.html',
+        ):
+            with self.subTest(name=name):
+                self.assertIn(name, cached)
+        self.assertNotIn('admin/base.html', cached)
+
+    def test_warm_templates_command(self):
+        """Команда сообщает, сколько шаблонов разобрано."""
+        out = StringIO()
+        call_command('warm_templates', stdout=out)
+        self.assertIn('Разобрано шаблонов', out.getvalue())
+
+    def test_first_request_logged(self):
+        """Первый запрос процесса замеряется и пишется в журнал один раз."""
+        middleware.first_request.clear()
+        client = Client()
+        with self.assertLogs('core.performance', 'INFO') as logs:
+            client.get(reverse('about:author'))
+            client.get(reverse('about:tech'))
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(
+            middleware.first_request['path'], reverse('about:author')
+        )
+        self.assertIn('total_ms', middleware.first_request)
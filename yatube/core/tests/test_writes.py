@@ -0,0 +1,100 @@
+import threading
+from concurrent.futures import Future
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, OperationalError
+from django.test import SimpleTestCase, TestCase
+
+from .. import writes
+
+User = get_user_model()
+
+
+class RunTest(SimpleTestCase):
+    @mock.patch('core.writes.time.sleep')
+    def test_retries_only_lock_errors(self, sleep):
+        """Запись повторяется при занятой базе, прочие ошибки — сразу."""
+        calls = []
+
+        def write():
+            calls.append(1)
+            if len(calls) < 3:
+                raise OperationalError('database is locked')
+            return 'ok'
+
+        with mock.patch('core.writes.transaction.atomic'):
+            self.assertEqual(writes.run(write), 'ok')
+            self.assertEqual(sleep.call_count, 2)
+            with self.assertRaises(OperationalError):
+                writes.run(
+                    mock.Mock(side_effect=OperationalError('no such table'))
+                )
+            with self.assertRaises(writes.WriteUnavailable):
+                writes.run(mock.Mock(side_effect=OperationalError('busy')))
+
+    def test_backoff_is_jittered_and_capped(self):
+        """Паузы случайны и не больше WRITE_RETRY_MAX_DELAY."""
+        delays = {writes.backoff(10) for _ in range(20)}
+        self.assertGreater(len(delays), 1)
+        with self.settings(WRITE_RETRY_MAX_DELAY=0.5):
+            self.assertLessEqual(
+                max(writes.backoff(10) for _ in range(20)), 0.5
+            )
+
+
+class RecordingBatcher(writes.Batcher):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batches = []
+
+    def flush(self, batch):
+        self.batches.append(len(batch))
+        return super().flush(batch)
+
+
+class BatcherTest(TestCase):
+    def test_failed_item_does_not_cancel_batch(self):
+        """Ошибка одной записи пачки не отменяет остальные."""
+        batcher = writes.Batcher(
+            lambda name: User.objects.create(username=name)
+        )
+        entries = [
+            (name, Future()) for name in ('first', 'second', 'first')
+        ]
+        batcher.flush(entries)
+        self.assertEqual(entries[1][1].result().username, 'second')
+        self.assertIsInstance(entries[2][1].exception(), IntegrityError)
+        self.assertEqual(User.objects.count(), 2)
+
+    def test_concurrent_writes_share_transaction(self):
+        """Записи одновременных потоков уходят одной пачкой."""
+        batcher = RecordingBatcher(lambda item: item * 2, window=0.5)
+        results = []
+        barrier = threading.Barrier(3)
+
+        def submit(item):
+            barrier.wait()
+            results.append(batcher.submit(item))
+
+        threads = [
+            threading.Thread(target=submit, args=(item,))
+            for item in (1, 2, 3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(results), [2, 4, 6])
+        self.assertEqual(batcher.batches, [3])
+
+    def test_writer_survives_unexpected_error(self):
+        """Сбой вне записи достаётся пачке, а поток писателя живёт дальше."""
+        batcher = writes.Batcher(lambda item: item * 2, window=0.01)
+        with mock.patch(
+            'core.writes.close_old_connections',
+            side_effect=[RuntimeError('сбой'), None]
+        ):
+            with self.assertRaisesMessage(RuntimeError, 'сбой'):
+                batcher.submit(1)
+            self.assertEqual(batcher.submit(2), 4)
@@ -1,5 +1,9 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from .middleware import first_request, view_stats
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +19,11 @@ def server_error(request):
     return render(
         request, 'core/500.html', status=500
     )
+
+
+@staff_member_required
+def performance_stats(request):
+    return JsonResponse(
+        {'first_request': first_request, 'views': view_stats.snapshot()},
+        json_dumps_params={'ensure_ascii': False}
+    )
@@ -0,0 +1,57 @@
+"""
+Прогрев шаблонов: все шаблоны проекта разбираются заранее и оседают
+в cached.Loader, так что первый запрос процесса их уже не компилирует.
+"""
+import os
+import time
+
+from django.conf import settings
+from django.template import TemplateSyntaxError, engines
+
+last_warmup = {}
+
+
+def _template_dirs(engine):
+    for loader in engine.template_loaders:
+        for inner in getattr(loader, 'loaders', [loader]):
+            yield from inner.get_dirs()
+
+
+def project_templates(engine):
+    """Имена шаблонов из каталогов проекта, без сторонних приложений."""
+    base = os.path.realpath(settings.BASE_DIR)
+    names = set()
+    for directory in _template_dirs(engine):
+        directory = os.path.realpath(str(directory))
+        if os.path.commonpath([base, directory]) != base:
+            continue
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                if filename.startswith('.'):
+                    continue
+                path = os.path.relpath(os.path.join(root, filename), directory)
+                names.add(path.replace(os.sep, '/'))
+    return sorted(names)
+
+
+def warm_templates():
+    """Разбирает шаблоны проекта; возвращает число шаблонов и ошибки."""
+    start = time.perf_counter()
+    warmed, errors = 0, {}
+    for backend in engines.all():
+        engine = getattr(backend, 'engine', None)
+        if engine is None:
+            continue
+        for name in project_templates(engine):
+            try:
+                engine.get_template(name)
+            except TemplateSyntaxError as exc:
+                errors[name] = str(exc)
+            else:
+                warmed += 1
+    last_warmup.update(
+        templates=warmed,
+        errors=errors,
+        duration_ms=round((time.perf_counter() - start) * 1000, 3)
+    )
+    return last_warmup
@@ -0,0 +1,189 @@
+"""
+Записи под конкуренцией за единственную блокировку писателя SQLite.
+run() выполняет запись в транзакции и при «database is locked» повторяет
+её после паузы со случайным разбросом (full jitter), чтобы столкнувшиеся
+воркеры не просыпались одновременно. Batcher собирает записи из
+одновременных запросов процесса в одну короткую транзакцию: каждая
+запись в ней — своя точка сохранения, а запрос получает ответ, только
+когда транзакция зафиксирована.
+"""
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from functools import wraps
+
+from django.conf import settings
+from django.db import (
+    DatabaseError, OperationalError, close_old_connections, transaction
+)
+from django.shortcuts import render
+
+
+class WriteUnavailable(Exception):
+    """Запись не прошла за все попытки или не подтверждена вовремя."""
+
+
+def is_lock_error(error):
+    message = str(error).lower()
+    return isinstance(error, OperationalError) and (
+        'locked' in message or 'busy' in message
+    )
+
+
+def backoff(attempt):
+    cap = min(
+        settings.WRITE_RETRY_MAX_DELAY,
+        settings.WRITE_RETRY_DELAY * 2 ** attempt
+    )
+    return random.uniform(0, cap)
+
+
+def run(write, *args, **kwargs):
+    """Результат write(*args, **kwargs) в транзакции с повторами."""
+    attempts = settings.WRITE_RETRY_ATTEMPTS
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                return write(*args, **kwargs)
+        except OperationalError as error:
+            if not is_lock_error(error):
+                raise
+            if attempt == attempts - 1:
+                raise WriteUnavailable(str(error)) from error
+            time.sleep(backoff(attempt))
+
+
+def save_new(instance):
+    # После отката повторная попытка должна снова вставить строку,
+    # а не искать её по id из неудачной попытки.
+    instance.pk = None
+    instance._state.adding = True
+    instance.save()
+    return instance
+
+
+class Batcher:
+    """
+    Записи write(item) из разных потоков процесса, собранные в пачки:
+    первая запись ждёт соседей не дольше window секунд, в пачке — не
+    больше size записей. При window=0 запись идёт сразу в потоке запроса.
+    """
+
+    def __init__(self, write, window=None, size=None):
+        self.write = write
+        self._window = window
+        self._size = size
+        self._lock = threading.Lock()
+        self._pid = None
+
+    @property
+    def window(self):
+        if self._window is None:
+            return settings.WRITE_BATCH_WINDOW
+        return self._window
+
+    @property
+    def size(self):
+        if self._size is None:
+            return settings.WRITE_BATCH_SIZE
+        return self._size
+
+    def submit(self, item):
+        """Результат записи после её фиксации в базе."""
+        if not self.window:
+            [(_, future)] = self.flush([(item, Future())])
+            return future.result()
+        future = Future()
+        self._queue().put((item, future))
+        try:
+            return future.result(timeout=settings.WRITE_ACK_TIMEOUT)
+        except TimeoutError:
+            raise WriteUnavailable('Запись не подтверждена вовремя.')
+
+    def _queue(self):
+        # Поток писателя не переживает fork: у процесса-наследника свой.
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pending = queue.Queue()
+                threading.Thread(
+                    target=self._loop, name='write-batcher', daemon=True
+                ).start()
+                self._pid = os.getpid()
+        return self._pending
+
+    def _collect(self, pending):
+        batch = [pending.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        pending = self._pending
+        while True:
+            batch = []
+            try:
+                batch = self._collect(pending)
+                close_old_connections()
+                self.flush(batch)
+            except Exception as error:
+                # Поток писателя в процессе один: ошибка достаётся пачке,
+                # а следующие записи он продолжает принимать.
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+
+    def _write_batch(self, batch):
+        outcomes = []
+        for item, future in batch:
+            try:
+                with transaction.atomic():
+                    outcomes.append((future, self.write(item), None))
+            except DatabaseError as error:
+                if is_lock_error(error):
+                    raise
+                outcomes.append((future, None, error))
+        return outcomes
+
+    def flush(self, batch):
+        """Пишет пачку и отвечает каждому ожидающему."""
+        try:
+            outcomes = run(self._write_batch, batch)
+        except Exception as error:
+            if len(batch) > 1 and not isinstance(error, WriteUnavailable):
+                # Ошибка одной записи, например внешнего ключа при COMMIT,
+                # не должна отменять соседние: они пишутся по одной.
+                for entry in batch:
+                    self.flush([entry])
+                return batch
+            for _, future in batch:
+                future.set_exception(error)
+            return batch
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+        return batch
+
+
+def unavailable_on_contention(view):
+    """Ответ 503 с Retry-After вместо 500, если запись так и не прошла."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except WriteUnavailable:
+            response = render(request, 'core/503.html', status=503)
+            response['Retry-After'] = '1'
+            return response
+    return wrapper
@@ -1,6 +1,35 @@
+from django.conf import settings
 from django.contrib import admin
+from django.http import StreamingHttpResponse
+
+from . import exporting, search
 from .models import Post, Group, Comment, Follow
 
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def export_action(format):
+    """Действие админки: выбранные записи потоком, без загрузки в память."""
+    def action(modeladmin, request, queryset):
+        kind = exporting.KINDS[modeladmin.model]
+        response = StreamingHttpResponse(
+            exporting.lines(kind, queryset, format),
+            content_type=CONTENT_TYPES[format]
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{kind}.{format}"'
+        )
+        return response
+    action.__name__ = f'export_{format}'
+    action.short_description = f'Выгрузить выбранные в {format.upper()}'
+    return action
+
+
+EXPORT_ACTIONS = [export_action(format) for format in exporting.FORMATS]
+
 
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
@@ -15,18 +44,31 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ('text',)
     list_filter = ('created',)
     empty_value_display = '-пусто-'
+    actions = EXPORT_ACTIONS
+
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо LIKE по всей таблице — лучшие совпадения из индекса FTS5.
+        if not search_term or not search.is_supported():
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        ids = search.match_ids(search_term, settings.SEARCH_ADMIN_LIMIT)
+        return queryset.filter(pk__in=ids), False
 
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('title', 'description')
+    actions = EXPORT_ACTIONS
 
 
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
     list_display = ('author', 'text')
+    actions = EXPORT_ACTIONS
 
 
 @admin.register(Follow)
 class FollowAdmin(admin.ModelAdmin):
     list_display = ('user', 'author')
+    actions = EXPORT_ACTIONS
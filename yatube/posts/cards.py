@@ -0,0 +1,63 @@
+"""
+Кеш отрисованных карточек постов для лент. Ключ — id поста и хеш всего,
+что видно в карточке, поэтому правка поста, автора или группы сама даёт
+новый ключ. Страница собирает карточки одним get_many и дорисовывает
+только недостающие.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+CARD_TEMPLATE = 'posts/includes/post_list.html'
+CARD_PREFIX = 'card:'
+
+
+def card_key(post):
+    content = '\x1f'.join(map(str, (
+        post.excerpt,
+        post.image.name,
+        post.created.isoformat(),
+        post.author.username,
+        post.author.get_full_name(),
+        post.group.slug if post.group_id else '',
+        get_language(),
+    )))
+    digest = hashlib.md5(content.encode()).hexdigest()
+    return f'{CARD_PREFIX}{post.pk}:{digest}'
+
+
+def _render(template, post, request):
+    # Карточку с заглушкой вместо миниатюры нельзя класть в кеш: шаблон
+    # миниатюры отмечает такую отрисовку в request.page_uncacheable.
+    page_uncacheable = getattr(request, 'page_uncacheable', False)
+    if request is not None:
+        request.page_uncacheable = False
+    html = template.render({'post': post, 'request': request})
+    cacheable = not getattr(request, 'page_uncacheable', False)
+    if request is not None:
+        request.page_uncacheable = page_uncacheable or not cacheable
+    return html, cacheable
+
+
+def render_cards(posts, request=None):
+    """Пары (пост, html карточки) в порядке posts."""
+    keyed = [(card_key(post), post) for post in posts]
+    cached = cache.get_many([key for key, _ in keyed])
+    template = None
+    rendered = {}
+    cards = []
+    for key, post in keyed:
+        html = cached.get(key)
+        if html is None:
+            template = template or get_template(CARD_TEMPLATE)
+            html, cacheable = _render(template, post, request)
+            if cacheable:
+                rendered[key] = html
+        cards.append((post, mark_safe(html)))
+    if rendered:
+        cache.set_many(rendered, settings.CARD_CACHE_TIMEOUT)
+    return cards
@@ -0,0 +1,96 @@
+"""
+Денормализованные счётчики. Меняются только атомарными UPDATE с F(),
+расхождения исправляют recount_users и recount_posts (команда recount).
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+
+from . import timeline
+from .models import Comment, Follow, Post, UserStats
+
+
+def _change(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def _counts(queryset, field, ids):
+    return dict(
+        # Без order_by() сортировка из Meta попала бы в GROUP BY.
+        queryset.filter(**{f'{field}__in': ids}).order_by().values(
+            field
+        ).annotate(total=Count('pk')).values_list(field, 'total')
+    )
+
+
+def change_user_stats(user_id, field, delta):
+    stats = UserStats.objects.filter(user_id=user_id)
+    if _change(stats, field, delta) or delta < 0:
+        return
+    UserStats.objects.get_or_create(user_id=user_id)
+    _change(stats, field, delta)
+
+
+def change_comments_count(post_id, delta):
+    _change(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+@transaction.atomic
+def recount_users(ids):
+    posts = _counts(Post.objects, 'author', ids)
+    followers = _counts(Follow.objects, 'author', ids)
+    following = _counts(Follow.objects, 'user', ids)
+    existing = UserStats.objects.in_bulk(ids)
+    changed, unpulled = [], []
+    for user_id in ids:
+        stats = existing.get(user_id) or UserStats(user_id=user_id)
+        actual = (
+            posts.get(user_id, 0),
+            followers.get(user_id, 0),
+            following.get(user_id, 0),
+        )
+        stored = (
+            stats.posts_count, stats.followers_count,
+            stats.following_count
+        )
+        pulled = stats.pulled
+        if actual[1] >= settings.TIMELINE_FANOUT_LIMIT:
+            pulled = True
+        elif actual[1] < timeline.unpull_limit():
+            pulled = False
+        if user_id in existing and (actual, pulled) == (
+            stored, stats.pulled
+        ):
+            continue
+        if stats.pulled and not pulled:
+            unpulled.append(user_id)
+        (stats.posts_count, stats.followers_count,
+         stats.following_count) = actual
+        stats.pulled = pulled
+        changed.append(stats)
+    UserStats.objects.bulk_create(
+        [stats for stats in changed if stats.user_id not in existing]
+    )
+    UserStats.objects.bulk_update(
+        [stats for stats in changed if stats.user_id in existing],
+        ('posts_count', 'followers_count', 'following_count', 'pulled')
+    )
+    if unpulled:
+        timeline.refill(authors=unpulled)
+    return len(changed)
+
+
+@transaction.atomic
+def recount_posts(ids):
+    comments = _counts(Comment.objects, 'post', ids)
+    changed = [
+        Post(pk=pk, comments_count=comments.get(pk, 0))
+        for pk, stored in Post.objects.filter(pk__in=ids).values_list(
+            'pk', 'comments_count'
+        )
+        if comments.get(pk, 0) != stored
+    ]
+    Post.objects.bulk_update(changed, ('comments_count',))
+    return len(changed)
@@ -0,0 +1,115 @@
+"""
+Число записей для нумерованных страниц без COUNT(*) на каждый запрос.
+Значение лежит в кеше вместе с версиями областей ленты (core.cache): после
+записи в ленту или по истечении COUNT_REFRESH_INTERVAL запрос получает
+прежнее число, а точное пересчитывается в фоне. Пока в кеше ничего нет,
+для таблицы целиком берётся оценка планировщика.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from core.cache import get_versions
+
+COUNT_PREFIX = 'count:'
+REFRESHING_PREFIX = 'count-refreshing:'
+
+_executor = None
+
+
+def estimate(queryset):
+    """Оценка планировщика для запроса без условий; None — оценки нет."""
+    if queryset.query.where:
+        return None
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [table]
+            )
+        elif connection.vendor == 'sqlite':
+            # sqlite_stat1 появляется после ANALYZE или PRAGMA optimize.
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+            )
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute(
+                'SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [table]
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    total = int(str(row[0]).split()[0].split('.')[0])
+    return total if total >= 0 else None
+
+
+def _refresh(name, queryset, versions):
+    try:
+        total = queryset.count()
+        cache.set(
+            COUNT_PREFIX + name,
+            (total, versions, time.time()),
+            settings.COUNT_CACHE_TIMEOUT
+        )
+        return total
+    finally:
+        cache.delete(REFRESHING_PREFIX + name)
+
+
+def _refresh_in_thread(name, queryset, versions):
+    try:
+        _refresh(name, queryset, versions)
+    finally:
+        connection.close()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.COUNT_REFRESH_THREADS,
+            thread_name_prefix='count-refresh'
+        )
+    return _executor
+
+
+def _schedule(name, queryset, versions):
+    """Пересчёт в фоне; без фоновых потоков — сразу, с результатом."""
+    # Один пересчёт на ключ за раз, даже при нескольких процессах.
+    if not cache.add(REFRESHING_PREFIX + name, True,
+                     settings.COUNT_REFRESH_INTERVAL):
+        return None
+    if settings.COUNT_REFRESH_THREADS:
+        _get_executor().submit(_refresh_in_thread, name, queryset, versions)
+        return None
+    return _refresh(name, queryset, versions)
+
+
+def cached_count(name, queryset, scopes=()):
+    """
+    Число записей queryset под именем name. Устаревшее значение отдаётся
+    сразу, точное считается в фоне; синхронно — только самый первый раз,
+    когда нет и оценки планировщика.
+    """
+    versions = get_versions(scopes) if scopes else []
+    cached = cache.get(COUNT_PREFIX + name)
+    if cached is None:
+        estimated = estimate(queryset)
+        if estimated is None:
+            return _refresh(name, queryset, versions)
+        refreshed = _schedule(name, queryset, versions)
+        return estimated if refreshed is None else refreshed
+    total, cached_versions, computed = cached
+    age = time.time() - computed
+    if cached_versions != versions or age > settings.COUNT_REFRESH_INTERVAL:
+        refreshed = _schedule(name, queryset, versions)
+        if refreshed is not None:
+            return refreshed
+    return total
@@ -0,0 +1,82 @@
+"""
+Граф подписок в кеше: для каждого пользователя — отсортированный массив
+id авторов, на которых он подписан, в виде байтов array('q'). Проверка
+«подписан ли A на B» и «на кого из этих авторов подписан A» — двоичный
+поиск в памяти; база читается только при промахе. Подписка и отписка —
+одна запись каждая: повтор подписки отсекает ограничение
+unique_following, а не предварительный exists().
+"""
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from .models import Follow
+
+KEY_PREFIX = 'following:'
+
+
+def _key(user_id):
+    return f'{KEY_PREFIX}{user_id}'
+
+
+def following_ids(user_id):
+    """Отсортированный array id авторов, на которых подписан user_id."""
+    cached = cache.get(_key(user_id))
+    ids = array('q')
+    if cached is not None:
+        ids.frombytes(cached)
+        return ids
+    ids.extend(
+        Follow.objects.filter(user_id=user_id).order_by(
+            'author_id'
+        ).values_list('author_id', flat=True)
+    )
+    cache.set(_key(user_id), ids.tobytes(), settings.FOLLOW_GRAPH_TIMEOUT)
+    return ids
+
+
+def _contains(ids, author_id):
+    index = bisect_left(ids, author_id)
+    return index < len(ids) and ids[index] == author_id
+
+
+def is_following(user, author_id):
+    if not user.is_authenticated or user.pk == author_id:
+        return False
+    return _contains(following_ids(user.pk), author_id)
+
+
+def followed_among(user, author_ids):
+    """Те из author_ids, на кого подписан user, — без запроса на каждого."""
+    if not user.is_authenticated:
+        return set()
+    ids = following_ids(user.pk)
+    return {
+        author_id for author_id in author_ids if _contains(ids, author_id)
+    }
+
+
+def forget(user_id):
+    key = _key(user_id)
+    cache.delete(key)
+    # Читатель между записью и COMMIT мог закешировать прежний набор.
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def follow(user, author):
+    """Подписывает user на author; False, если подписка уже была."""
+    try:
+        with transaction.atomic():
+            Follow.objects.create(user=user, author=author)
+    except IntegrityError:
+        return False
+    return True
+
+
+def unfollow(user, author):
+    """Отписывает user от author; False, если подписки не было."""
+    deleted, _ = Follow.objects.filter(user=user, author=author).delete()
+    return bool(deleted)
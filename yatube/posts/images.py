@@ -0,0 +1,40 @@
+"""
+Картинки постов хранятся по хешу содержимого, и один файл может быть
+у многих постов. Ссылками служат сами значения Post.image (по ним есть
+индекс), поэтому счётчик ссылок не может разойтись с данными. Файл без
+ссылок не удаляется, если его сохраняли последние IMAGE_RELEASE_GRACE
+секунд: пост другого запроса с тем же файлом может быть ещё не
+зафиксирован.
+"""
+from django.conf import settings
+from django.db import transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from .models import Post
+
+
+def image_file(name):
+    return ImageFile(name, Post._meta.get_field('image').storage)
+
+
+def references(name):
+    return Post.objects.filter(image=name).count()
+
+
+def _delete_if_unused(name):
+    if not name:
+        return
+    storage = Post._meta.get_field('image').storage
+    with storage.lock():
+        if references(name) or storage.saved_within(
+            name, settings.IMAGE_RELEASE_GRACE
+        ):
+            return
+        default.backend.delete(image_file(name))
+
+
+def release(name):
+    """Удаляет файл и его миниатюры, когда на него не осталось ссылок."""
+    if name:
+        transaction.on_commit(lambda: _delete_if_unused(name))
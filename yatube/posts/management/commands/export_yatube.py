@@ -0,0 +1,78 @@
+import time
+from datetime import datetime, time as day_start
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from posts import exporting
+
+
+def since_value(value):
+    moment = parse_datetime(value)
+    if moment is None:
+        date = parse_date(value)
+        if date is None:
+            raise CommandError('--since: ожидается дата ISO 8601.')
+        moment = datetime.combine(date, day_start())
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, timezone.utc)
+    return moment
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоковая выгрузка групп, постов, комментариев или подписок '
+        'в NDJSON или CSV.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(exporting.EXPORTS))
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл выгрузки; «-» — стандартный вывод.'
+        )
+        parser.add_argument(
+            '--format', choices=exporting.FORMATS, default='ndjson'
+        )
+        parser.add_argument(
+            '--since',
+            help='Только записи, созданные начиная с этой даты.'
+        )
+        parser.add_argument(
+            '--gzip', action='store_true',
+            help='Сжать файл (включается и расширением .gz).'
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, kind, output, format, since, gzip, chunk_size,
+               **options):
+        if chunk_size < 1:
+            raise CommandError('--chunk-size должен быть больше нуля.')
+        if since and not exporting.has_created(kind):
+            raise CommandError(f'У {kind} нет даты создания для --since.')
+        if gzip and output == '-':
+            raise CommandError('Сжатие возможно только при выгрузке в файл.')
+        lines = exporting.lines(
+            kind,
+            format=format,
+            since=since_value(since) if since else None,
+            chunk_size=chunk_size
+        )
+        start = time.perf_counter()
+        if output == '-':
+            total = self.write(self.stdout, lines)
+            report = self.stderr
+        else:
+            with exporting.open_target(output, gzip) as target:
+                total = self.write(target, lines)
+            report = self.stdout
+        elapsed = time.perf_counter() - start
+        rate = total / elapsed if elapsed else 0.0
+        report.write(f'Выгружено строк: {total}, {rate:.0f} строк/с.')
+
+    def write(self, target, lines):
+        total = 0
+        for total, line in enumerate(lines, 1):
+            target.write(line)
+        return total
@@ -0,0 +1,75 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import importing
+from posts.models import ImportCheckpoint
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоковый импорт групп, постов, комментариев или подписок из '
+        'NDJSON или CSV (в том числе .gz). Прерванный импорт продолжается '
+        'с места сбоя.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(importing.IMPORTERS))
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format', choices=importing.FORMATS,
+            help='По умолчанию — по расширению файла.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--checkpoint',
+            help='Имя отметки для продолжения; по умолчанию вид и путь.'
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать сначала, забыв прежнюю отметку.'
+        )
+        parser.add_argument(
+            '--skip-derived', action='store_true',
+            help='Не пересчитывать счётчики, ленты и поисковый индекс.'
+        )
+
+    def handle(self, *args, kind, path, format, batch_size, checkpoint,
+               restart, skip_derived, **options):
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        if not os.path.isfile(path):
+            raise CommandError(f'Нет файла {path}.')
+        self.verbosity = options['verbosity']
+        source = checkpoint or f'{kind}:{os.path.abspath(path)}'
+        if restart:
+            ImportCheckpoint.objects.filter(source=source[:255]).delete()
+        importer = importing.IMPORTERS[kind]()
+        run = importing.ImportRun(
+            importer, source, batch_size, self.report, self.report_error,
+            derived=not skip_derived
+        )
+        if run.skipped:
+            self.stdout.write(f'Продолжение после строки {run.skipped}.')
+        with importing.open_source(path) as stream:
+            run.run(importing.read_records(
+                stream, format or importing.detect_format(path)
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {run.processed}, записано: {run.written}, '
+            f'ошибок: {run.errors}, {run.rate:.0f} строк/с.'
+        ))
+
+    def report(self, processed, written, rate):
+        if self.verbosity > 1:
+            self.stdout.write(
+                f'{processed} строк, записано {written}, {rate:.0f} строк/с'
+            )
+
+    def report_error(self, number, exc):
+        messages = '; '.join(
+            f'{field}: {" ".join(errors)}' if field != '__all__'
+            else ' '.join(errors)
+            for field, errors in exc.message_dict.items()
+        )
+        self.stderr.write(f'Строка {number}: {messages}')
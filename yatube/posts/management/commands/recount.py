@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount_posts, recount_users
+from posts.models import Post, User
+
+
+def _batches(queryset, batch_size):
+    last_pk = 0
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=last_pk).order_by('pk').values_list(
+                'pk', flat=True
+            )[:batch_size]
+        )
+        if not ids:
+            return
+        yield ids
+        last_pk = ids[-1]
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        fixed_users = sum(
+            recount_users(ids)
+            for ids in _batches(User.objects.all(), batch_size)
+        )
+        fixed_posts = sum(
+            recount_posts(ids)
+            for ids in _batches(Post.objects.all(), batch_size)
+        )
+        self.stdout.write(
+            f'Исправлено пользователей: {fixed_users}, '
+            f'постов: {fixed_posts}'
+        )
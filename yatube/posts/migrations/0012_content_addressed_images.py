@@ -0,0 +1,19 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:07
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, db_index=True, storage=core.storage.NormalizedImageStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:54
+
+import core.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_excerpt'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='created',
+            field=core.models.CreatedField(auto_now_add=True, verbose_name='Дата создания'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='created',
+            field=core.models.CreatedField(auto_now_add=True, verbose_name='Дата создания'),
+        ),
+    ]
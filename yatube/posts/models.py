@@ -1,10 +1,19 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils.text import Truncator
 
 from core.models import CreatedModel
+from core.storage import NormalizedImageStorage
 
 User = get_user_model()
 
+# Длина текста поста в карточках лент.
+EXCERPT_LENGTH = 500
+
+
+def make_excerpt(text):
+    return Truncator(text).chars(EXCERPT_LENGTH)
+
 
 class Group(models.Model):
     title = models.CharField(
@@ -49,16 +58,58 @@ class Post(CreatedModel):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
-        blank=True
+        storage=NormalizedImageStorage(),
+        blank=True,
+        db_index=True
+    )
+    comments_count = models.PositiveIntegerField(
+        'Комментариев',
+        default=0,
+        editable=False
+    )
+    # Начало текста для лент: они не читают text целиком. Обновляется при
+    # сохранении; bulk_create должен заполнять его сам (make_excerpt).
+    excerpt = models.CharField(
+        'Начало текста',
+        max_length=EXCERPT_LENGTH,
+        blank=True,
+        editable=False
     )
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        self.excerpt = make_excerpt(self.text)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'text' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'excerpt'}
+        # Счётчик меняется только через F() в posts.counters: при правке
+        # поста его устаревшее значение не должно попасть в базу.
+        if not self._state.adding and update_fields is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'comments_count'
+            ]
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = 'Посты'
         verbose_name_plural = 'Посты'
         ordering = ('-created',)
+        indexes = [
+            models.Index(
+                fields=('-created', '-id'), name='post_created_idx'
+            ),
+            models.Index(
+                fields=('author', '-created', '-id'),
+                name='post_author_created_idx'
+            ),
+            models.Index(
+                fields=('group', '-created', '-id'),
+                name='post_group_created_idx'
+            ),
+        ]
 
 
 class Comment(CreatedModel):
@@ -79,6 +130,13 @@ class Comment(CreatedModel):
         help_text='Текст нового комментария'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=('post', 'created'), name='comment_post_created_idx'
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -100,3 +158,84 @@ class Follow(models.Model):
                 fields=('user', 'author'), name='unique_following'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=('author', 'user'), name='follow_author_user_idx'
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    """Денормализованные счётчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='stats',
+        on_delete=models.CASCADE
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+    pulled = models.BooleanField(
+        'Посты подмешиваются в ленты',
+        default=False,
+        help_text='Новые посты не раскладываются по лентам подписчиков.'
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        related_name='timeline',
+        on_delete=models.CASCADE
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='timeline_entries',
+        on_delete=models.CASCADE
+    )
+    author = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    created = models.DateTimeField()
+
+    class Meta:
+        ordering = ('-created', '-post')
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'post'), name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-created', '-post'),
+                name='timeline_user_created_idx'
+            ),
+            models.Index(
+                fields=('user', 'author'), name='timeline_user_author_idx'
+            ),
+        ]
+
+
+class ImportCheckpoint(models.Model):
+    """Сколько строк источника уже записала команда import_yatube."""
+    source = models.CharField('Источник', max_length=255, unique=True)
+    position = models.PositiveIntegerField('Обработано строк', default=0)
+    updated = models.DateTimeField('Обновлено', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Отметка импорта'
+        verbose_name_plural = 'Отметки импорта'
+
+    def __str__(self):
+        return f'{self.source}: {self.position}'
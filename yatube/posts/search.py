@@ -0,0 +1,202 @@
+"""
+Полнотекстовый поиск по постам. В SQLite тексты постов продублированы
+в таблице FTS5 posts_post_fts (rowid = id поста), которую синхронно
+обновляют сигналы Post; порядок выдачи задаёт bm25.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .models import Post
+from .utils import (
+    KeysetPage, KeysetPaginator, encode_cursor, get_cursors, parse_rank
+)
+
+FTS_TABLE = 'posts_post_fts'
+WORD_RE = re.compile(r'\w+')
+
+
+def is_supported():
+    return connection.vendor == 'sqlite'
+
+
+def index_post(post):
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, post.text]
+        )
+
+
+def remove_post(post_id):
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+
+def index_posts(ids):
+    """index_post для пачки постов, записанных в обход сигналов."""
+    if not is_supported() or not ids:
+        return
+    ids = list(ids)
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', ids
+        )
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) '
+            f'SELECT id, text FROM {Post._meta.db_table} '
+            f'WHERE id IN ({placeholders})',
+            ids
+        )
+
+
+def rebuild(batch_size=1000):
+    """
+    Перестраивает индекс пачками; возвращает число постов. Каждая пачка
+    заменяет свой диапазон id целиком, так что индекс не пустеет и поиск
+    работает всё время перестройки.
+    """
+    with connection.cursor() as cursor:
+        last_pk, total = 0, 0
+        while True:
+            batch = list(
+                Post.objects.filter(pk__gt=last_pk).order_by(
+                    'pk'
+                ).values_list('pk', 'text')[:batch_size]
+            )
+            if not batch:
+                break
+            with transaction.atomic():
+                cursor.execute(
+                    f'DELETE FROM {FTS_TABLE} '
+                    f'WHERE rowid > %s AND rowid <= %s',
+                    [last_pk, batch[-1][0]]
+                )
+                cursor.executemany(
+                    f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+                    batch
+                )
+            last_pk, total = batch[-1][0], total + len(batch)
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid > %s', [last_pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"
+        )
+    return total
+
+
+def to_match_query(query):
+    """
+    Превращает пользовательский ввод в запрос FTS5: все слова должны
+    встретиться, последнее может быть началом слова.
+    """
+    words = WORD_RE.findall(query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _ranked(match, filters, cursor=None, backward=False):
+    where, params = [f'{FTS_TABLE} MATCH %s'], [match]
+    for column, value in filters.items():
+        where.append(f'p.{column} = %s')
+        params.append(value)
+    sql = (
+        f'SELECT bm25({FTS_TABLE}) AS score, f.rowid AS id '
+        f'FROM {FTS_TABLE} f JOIN posts_post p ON p.id = f.rowid '
+        f'WHERE {" AND ".join(where)}'
+    )
+    sign, direction = ('<', 'DESC') if backward else ('>', 'ASC')
+    outer_where = ''
+    if cursor is not None:
+        outer_where = (
+            f'WHERE score {sign} %s OR (score = %s AND id {sign} %s)'
+        )
+        params += [cursor[0], cursor[0], cursor[1]]
+    return (
+        f'SELECT score, id FROM ({sql}) {outer_where} '
+        f'ORDER BY score {direction}, id {direction} LIMIT %s',
+        params
+    )
+
+
+def _fetch_ranked(match, filters, per_page, cursor=None, backward=False):
+    sql, params = _ranked(match, filters, cursor, backward)
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql, params + [per_page + 1])
+        rows = db_cursor.fetchall()
+    return rows[:per_page], len(rows) > per_page
+
+
+def match_ids(query, limit):
+    """id лучших совпадений, для поиска в админке."""
+    match = to_match_query(query)
+    if match is None or not is_supported():
+        return []
+    rows, _ = _fetch_ranked(match, {}, limit)
+    return [pk for score, pk in rows]
+
+
+def _page(request, rows, has_next, has_previous):
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [pk for score, pk in rows]
+    )
+    return KeysetPage(
+        [posts[pk] for score, pk in rows if pk in posts],
+        request,
+        has_next,
+        has_previous,
+        encode_cursor(*rows[0]) if rows else None,
+        encode_cursor(*rows[-1]) if rows else None,
+    )
+
+
+def _ranked_page(request, match, filters, after=None, before=None):
+    per_page = settings.PGN_COUNT
+    if before is not None:
+        rows, has_previous = _fetch_ranked(
+            match, filters, per_page, before, backward=True
+        )
+        if rows:
+            rows.reverse()
+            return _page(request, rows, True, has_previous)
+    elif after is not None:
+        rows, has_next = _fetch_ranked(match, filters, per_page, after)
+        if rows:
+            return _page(request, rows, has_next, True)
+    rows, has_next = _fetch_ranked(match, filters, per_page)
+    return _page(request, rows, has_next, False)
+
+
+def search_page(request, query, author=None, group=None):
+    """
+    Страница результатов поиска с фильтрами по автору и группе; курсоры
+    ?after=/?before= — ранги FTS5 или, без него, даты постов.
+    """
+    filters = {}
+    if author is not None:
+        filters['author_id'] = author.pk
+    if group is not None:
+        filters['group_id'] = group.pk
+    if is_supported():
+        match = to_match_query(query)
+        if match is None:
+            return KeysetPage([], request, False, False, None, None)
+        return _ranked_page(
+            request, match, filters, **get_cursors(request, parse_rank)
+        )
+    # Без FTS5 — медленный, но рабочий поиск подстрокой.
+    post_list = Post.objects.filter(
+        Q(text__icontains=query), **filters
+    ).select_related('author', 'group')
+    paginator = KeysetPaginator(post_list, settings.PGN_COUNT)
+    return paginator.get_page(request, **paginator.cursors(request))
@@ -0,0 +1,199 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.cache import bump
+from . import counters, follow_graph, images, search, timeline
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .utils import GLOBAL_SCOPE, author_scope, group_scope, post_scope
+
+SHOWN_USER_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Post)
+def index_post_text(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post_text(sender, instance, **kwargs):
+    search.remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    timeline.prune(instance)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def forget_following(sender, instance, **kwargs):
+    follow_graph.forget(instance.user_id)
+
+
+@receiver(pre_save, sender=User)
+def remember_old_username(sender, instance, raw=False, update_fields=None,
+                          **kwargs):
+    instance._old_username = None
+    if raw or not instance.pk:
+        return
+    if update_fields is not None and 'username' not in update_fields:
+        return
+    instance._old_username = User.objects.filter(
+        pk=instance.pk
+    ).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_pages(sender, instance, created, raw=False,
+                          update_fields=None, **kwargs):
+    # Имя автора видно в профиле и на страницах его постов; вход в
+    # систему меняет только last_login и страниц не касается.
+    if created or raw:
+        return
+    if update_fields is not None and not SHOWN_USER_FIELDS & set(
+        update_fields
+    ):
+        return
+    usernames = {instance.username}
+    if getattr(instance, '_old_username', None):
+        usernames.add(instance._old_username)
+    bump(*map(author_scope, usernames))
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_user_stats(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.change_user_stats(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.post_id:
+        counters.change_comments_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    if instance.post_id:
+        counters.change_comments_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_user_stats(instance.author_id, 'followers_count', 1)
+        counters.change_user_stats(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.change_user_stats(instance.author_id, 'followers_count', -1)
+    counters.change_user_stats(instance.user_id, 'following_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def pull_popular_author(sender, instance, created, raw=False, **kwargs):
+    # Срабатывает после count_new_follow и видит новое число подписчиков.
+    if created and not raw:
+        timeline.pull([instance.author_id])
+
+
+@receiver(post_delete, sender=Follow)
+def refill_unpulled_author(sender, instance, **kwargs):
+    # Срабатывает после count_deleted_follow и в той же транзакции, так
+    # что порог переходит ровно одно удаление.
+    timeline.unpull(instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_values(sender, instance, raw=False, **kwargs):
+    instance._old_group_slug = instance._old_image = None
+    if instance.pk and not raw:
+        instance._old_group_slug, instance._old_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group__slug', 'image'
+            ).first() or (None, None)
+        )
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, created, raw=False, **kwargs):
+    old_image = getattr(instance, '_old_image', None)
+    if not raw and old_image and old_image != instance.image.name:
+        images.release(old_image)
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    images.release(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    scopes = {
+        GLOBAL_SCOPE,
+        author_scope(instance.author.username),
+        post_scope(instance.pk),
+    }
+    if instance.group_id:
+        scopes.add(group_scope(instance.group.slug))
+    if getattr(instance, '_old_group_slug', None):
+        scopes.add(group_scope(instance._old_group_slug))
+    bump(*scopes)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, **kwargs):
+    # Карточки лент число комментариев не показывают, поэтому общую
+    # ленту комментарий не сбрасывает: иначе на живом сайте её кеш не
+    # доживал бы до следующего запроса.
+    post = Post.objects.select_related('author', 'group').filter(
+        pk=instance.post_id
+    ).first()
+    if post is None:
+        return
+    scopes = [author_scope(post.author.username)]
+    if post.group_id:
+        scopes.append(group_scope(post.group.slug))
+    bump(post_scope(post.pk), *scopes)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_pages(sender, instance, **kwargs):
+    usernames = User.objects.filter(
+        pk__in=(instance.user_id, instance.author_id)
+    ).values_list('username', flat=True)
+    bump(*map(author_scope, usernames))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_pages(sender, instance, **kwargs):
+    bump(GLOBAL_SCOPE, group_scope(instance.slug))
@@ -0,0 +1,11 @@
+from django import template
+
+from .. import cards
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """Карточки постов страницы из кеша, с дорисовкой недостающих."""
+    return cards.render_cards(posts, context.get('request'))
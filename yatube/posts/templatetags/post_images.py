@@ -0,0 +1,19 @@
+from django import template
+
+from core.cache import mark_uncacheable
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def precomputed_thumbnail(context, image, geometry):
+    """
+    Готовая миниатюра картинки или None. Недостающая миниатюра ставится
+    в очередь, а страница с заглушкой не попадает в кеш.
+    """
+    thumbnail = thumbnails.lookup(image, geometry)
+    if image and thumbnail is None:
+        thumbnails.enqueue(image)
+        mark_uncacheable(context.get('request'))
+    return thumbnail
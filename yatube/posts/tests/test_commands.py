@@ -0,0 +1,267 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import search
+from ..importing import PostImporter
+from ..models import (
+    Comment, Follow, Group, ImportCheckpoint, Post, TimelineEntry, UserStats
+)
+
+User = get_user_model()
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def tearDownModule():
+    shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+
+def write_file(name, content):
+    path = os.path.join(TEMP_DIR, name)
+    with open(path, 'w', encoding='utf-8') as source:
+        source.write(content)
+    return path
+
+
+def ndjson(*rows):
+    return ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+
+
+class ImportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def import_file(self, kind, path, **options):
+        stderr = StringIO()
+        call_command(
+            'import_yatube', kind, path, stdout=StringIO(), stderr=stderr,
+            **options
+        )
+        return stderr.getvalue()
+
+    def test_import_posts_and_comments(self):
+        """Импорт пишет валидные строки и сообщает о плохих."""
+        groups = write_file('groups.ndjson', ndjson(
+            {'title': 'Группа', 'slug': 'imported', 'description': 'Про всё'},
+            {'title': 'Без слага', 'slug': 'не слаг', 'description': '-'},
+        ))
+        self.import_file('groups', groups)
+        self.assertEqual(
+            list(Group.objects.values_list('slug', flat=True)), ['imported']
+        )
+        posts = write_file('posts.ndjson', ndjson(
+            {'id': 100, 'author': 'author', 'text': 'Первый',
+             'group': 'imported', 'created': '2020-01-02T03:04:05Z'},
+            {'author': 'author', 'text': 'Второй'},
+            {'author': 'ghost', 'text': 'Чужой'},
+            {'author': 'author', 'text': '  '},
+        ) + '{broken\n')
+        errors = self.import_file('posts', posts, batch_size=2)
+        self.assertIn('Строка 3: author', errors)
+        self.assertIn('Строка 4: text', errors)
+        self.assertIn('Строка 5', errors)
+        post = Post.objects.get(pk=100)
+        self.assertEqual(post.group.slug, 'imported')
+        self.assertEqual(
+            post.created,
+            timezone.make_aware(datetime(2020, 1, 2, 3, 4, 5), timezone.utc)
+        )
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 2
+        )
+        comments = write_file(
+            'comments.csv',
+            'post,author,text\n100,reader,Комментарий\n999,reader,Мимо\n'
+        )
+        errors = self.import_file('comments', comments)
+        self.assertIn('Строка 2: post', errors)
+        self.assertEqual(Comment.objects.get().post_id, 100)
+        self.assertEqual(Post.objects.get(pk=100).comments_count, 1)
+
+    def test_import_reports_existing_ids(self):
+        """Строки с занятым id — ошибки, а не молча пропущенные записи."""
+        Post.objects.create(pk=7, author=self.author, text='Уже есть')
+        path = write_file('conflicts.ndjson', ndjson(
+            {'id': 7, 'author': 'author', 'text': 'Занятый id'},
+            {'id': 8, 'author': 'author', 'text': 'Новый'},
+            {'id': 8, 'author': 'author', 'text': 'Повтор'},
+        ))
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            'import_yatube', 'posts', path, stdout=stdout, stderr=stderr
+        )
+        errors = stderr.getvalue()
+        self.assertIn('Строка 1: id: Такая запись уже есть.', errors)
+        self.assertIn('Строка 3: id', errors)
+        self.assertIn('записано: 1, ошибок: 2', stdout.getvalue())
+        self.assertEqual(Post.objects.get(pk=8).text, 'Новый')
+
+    def test_import_derives_only_own_rows(self):
+        """Ленты, индекс и счётчики достраиваются для записей импорта."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserStats.objects.filter(user=self.reader).update(posts_count=5)
+        UserStats.objects.filter(user=self.author).update(posts_count=3)
+        path = write_file('derived.ndjson', ndjson(
+            {'id': 50, 'author': 'author', 'text': 'Импортный пост'},
+            {'author': 'author', 'text': 'Ещё один'},
+        ))
+        self.import_file('posts', path)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2
+        )
+        # Счётчики получают прибавку, а не пересчёт: расхождения, и свои,
+        # и чужие, остаются до recount.
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 5
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).posts_count, 5
+        )
+        if search.is_supported():
+            self.assertEqual(len(search.match_ids('импортный', 10)), 1)
+            self.assertEqual(len(search.match_ids('ещё', 10)), 1)
+
+    def test_import_follows_fills_timeline(self):
+        """Импорт подписок пересчитывает счётчики и достраивает ленты."""
+        Post.objects.create(author=self.author, text='Пост')
+        follows = write_file(
+            'follows.csv',
+            'user,author\nreader,author\nreader,author\nreader,reader\n'
+        )
+        errors = self.import_file('follows', follows)
+        self.assertIn('Строка 2: author: Такая запись уже есть.', errors)
+        self.assertIn('Строка 3: author', errors)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 1
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 1
+        )
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader))
+
+    def test_import_resumes_after_crash(self):
+        """После сбоя импорт продолжается без повторов записанных строк."""
+        path = write_file('resume.ndjson', ndjson(*(
+            {'author': 'author', 'text': f'Пост {i}'} for i in range(5)
+        )))
+        write = PostImporter.write
+        calls = []
+
+        def crash_on_second_batch(importer, posts):
+            calls.append(len(posts))
+            if len(calls) == 2:
+                raise RuntimeError('сбой')
+            write(importer, posts)
+
+        with mock.patch.object(
+            PostImporter, 'write', crash_on_second_batch
+        ), self.assertRaises(RuntimeError):
+            self.import_file('posts', path, batch_size=2)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(ImportCheckpoint.objects.get().position, 2)
+        self.import_file('posts', path, batch_size=2)
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            [f'Пост {i}' for i in range(5)]
+        )
+        self.import_file('posts', path, batch_size=2)
+        self.assertEqual(Post.objects.count(), 5)
+        self.import_file('posts', path, restart=True)
+        self.assertEqual(Post.objects.count(), 10)
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.old = Post.objects.create(author=cls.author, text='Старый')
+        Post.objects.filter(pk=cls.old.pk).update(
+            created=timezone.now() - timedelta(days=10)
+        )
+        cls.new = Post.objects.create(
+            author=cls.author, group=cls.group, text='Новый'
+        )
+
+    def export(self, kind, **options):
+        stdout = StringIO()
+        call_command(
+            'export_yatube', kind, stdout=stdout, stderr=StringIO(),
+            chunk_size=1, **options
+        )
+        return stdout.getvalue()
+
+    def test_export_ndjson_since(self):
+        """--since выгружает только записи, созданные после даты."""
+        rows = [
+            json.loads(line) for line in self.export('posts').splitlines()
+        ]
+        self.assertEqual(
+            [row['id'] for row in rows], [self.old.pk, self.new.pk]
+        )
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+        rows = [
+            json.loads(line)
+            for line in self.export('posts', since=since).splitlines()
+        ]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['group'], 'group')
+        self.assertEqual(rows[0]['author'], 'author')
+
+    def test_export_gzip_csv_round_trip(self):
+        """Сжатая CSV-выгрузка читается импортом обратно."""
+        path = os.path.join(TEMP_DIR, 'posts.csv.gz')
+        call_command(
+            'export_yatube', 'posts', output=path, format='csv', gzip=True,
+            stdout=StringIO()
+        )
+        with gzip.open(path, 'rt', encoding='utf-8', newline='') as source:
+            rows = list(csv.DictReader(source))
+        self.assertEqual(rows[1]['text'], 'Новый')
+        created = dict(Post.objects.values_list('pk', 'created'))
+        Post.objects.all().delete()
+        call_command(
+            'import_yatube', 'posts', path, stdout=StringIO(),
+            stderr=StringIO()
+        )
+        self.assertEqual(
+            Post.objects.get(pk=self.new.pk).group_id, self.group.pk
+        )
+        self.assertEqual(
+            dict(Post.objects.values_list('pk', 'created')), created
+        )
+
+    def test_admin_export_action(self):
+        """Действие админки отдаёт выбранные записи потоком."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        response = self.client.post(
+            reverse('admin:posts_group_changelist'),
+            {'action': 'export_ndjson', '_selected_action': [self.group.pk]}
+        )
+        self.assertTrue(response.streaming)
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(json.loads(body)['slug'], 'group')
@@ -1,12 +1,17 @@
+import os
 import tempfile
 import shutil
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from .. import images
 from ..models import Group, Post, Comment
 
 User = get_user_model()
@@ -14,6 +19,12 @@ User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
+def make_image(width, height):
+    output = BytesIO()
+    Image.new('RGB', (width, height), 'white').save(output, 'PNG')
+    return output.getvalue()
+
+
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostCreateFormTest(TestCase):
     @classmethod
@@ -168,13 +179,69 @@ class PostCreateFormTest(TestCase):
         )
         self.assertEqual(Post.objects.count(), post_count + 1)
         last_post = Post.objects.first()
-        expect_answer = {
-            last_post.text: form_data['text'],
-            str(last_post.image): f'posts/{form_data["image"]}'
-        }
-        for obj, answer in expect_answer.items():
-            with self.subTest(obj=obj):
-                self.assertEqual(obj, answer)
+        self.assertEqual(last_post.text, form_data['text'])
+        # Картинка пережата в JPEG и лежит под хешем содержимого
+        self.assertRegex(
+            str(last_post.image), r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$'
+        )
+
+    def test_same_image_stored_once(self):
+        """Одинаковые картинки хранятся одним файлом."""
+        for text in ('Первый', 'Второй'):
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={
+                    'text': text,
+                    'image': SimpleUploadedFile(
+                        name=f'{text}.png',
+                        content=make_image(100, 50),
+                        content_type='image/png'
+                    )
+                }
+            )
+        first, second = Post.objects.filter(text__in=('Первый', 'Второй'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(images.references(first.image.name), 2)
+
+    def test_release_spares_file_of_uncommitted_upload(self):
+        """
+        Файл без ссылок удаляется, но не тот, что только что сохранила
+        загрузка, чей пост ещё не в базе.
+        """
+        post = Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                name='first.png', content=make_image(40, 20),
+                content_type='image/png'
+            )
+        )
+        storage = post.image.storage
+        name = post.image.name
+        post.delete()
+        os.utime(storage.path(name), (0, 0))
+        storage.save('posts/second.png', ContentFile(make_image(40, 20)))
+        images._delete_if_unused(name)
+        self.assertTrue(storage.exists(name))
+        os.utime(storage.path(name), (0, 0))
+        images._delete_if_unused(name)
+        self.assertFalse(storage.exists(name))
+
+    def test_large_image_downscaled(self):
+        """Большая картинка уменьшается до IMAGE_MAX_SIZE."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Большая картинка',
+                'image': SimpleUploadedFile(
+                    name='big.png',
+                    content=make_image(3000, 300),
+                    content_type='image/png'
+                )
+            }
+        )
+        post = Post.objects.get(text='Большая картинка')
+        self.assertLessEqual(post.image.width, settings.IMAGE_MAX_SIZE[0])
 
 
 class CommentCreateFormTest(TestCase):
@@ -1,7 +1,16 @@
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
 
-from ..models import Group, Post
+from ..models import (
+    EXCERPT_LENGTH, Comment, Follow, Group, Post, UserStats
+)
 
 User = get_user_model()
 
@@ -45,6 +54,19 @@ class PostModelTest(TestCase):
                 post._meta.get_field(value).verbose_name,
                 expected)
 
+    def test_created_keeps_explicit_date(self):
+        """Явная дата создания сохраняется, без неё ставится текущая."""
+        old = timezone.now() - timedelta(days=30)
+        start = timezone.now()
+        Post.objects.bulk_create([
+            Post(author=self.user, text='Старый', created=old),
+            Post(author=self.user, text='Новый'),
+        ])
+        self.assertEqual(Post.objects.get(text='Старый').created, old)
+        self.assertGreaterEqual(
+            Post.objects.get(text='Новый').created, start
+        )
+
     def test_post_help_text(self):
         """help_text в модели Post совпадает."""
         post = PostModelTest.post
@@ -57,3 +79,105 @@ class PostModelTest(TestCase):
             self.assertEqual(
                 post._meta.get_field(value).help_text,
                 expected)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются вместе с постами, комментариями и подписками."""
+        post = Post.objects.create(author=self.user, text='Текст')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий'
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.user)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(UserStats.objects.get(user=self.user).posts_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.user).followers_count, 1
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 1
+        )
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(
+            UserStats.objects.get(user=self.user).followers_count, 0
+        )
+        post.delete()
+        self.assertEqual(UserStats.objects.get(user=self.user).posts_count, 0)
+
+    def test_post_edit_keeps_comments_count(self):
+        """Правка поста не затирает счётчик комментариев."""
+        post = Post.objects.create(author=self.user, text='Текст')
+        stale = Post.objects.get(pk=post.pk)
+        Comment.objects.create(post=post, author=self.reader, text='Ком')
+        stale.text = 'Новый текст'
+        stale.save()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_migration_backfills_counters(self):
+        """Заполнение счётчиков в миграции считает все посты автора."""
+        for text in ('Первый', 'Второй', 'Третий'):
+            Post.objects.create(author=self.user, text=text)
+        Comment.objects.create(
+            post=Post.objects.first(), author=self.reader, text='Ком'
+        )
+        UserStats.objects.all().delete()
+        Post.objects.update(comments_count=0)
+        counters = import_module('posts.migrations.0010_counters')
+        counters.fill_counters(apps, None)
+        self.assertEqual(UserStats.objects.get(user=self.user).posts_count, 3)
+        self.assertEqual(
+            sum(Post.objects.values_list('comments_count', flat=True)), 1
+        )
+
+    def test_recount_repairs_drift(self):
+        """Команда recount исправляет разошедшиеся счётчики."""
+        post = Post.objects.create(author=self.user, text='Текст')
+        Comment.objects.create(post=post, author=self.reader, text='Ком')
+        Post.objects.filter(pk=post.pk).update(comments_count=5)
+        UserStats.objects.filter(user=self.user).delete()
+        call_command('recount', batch_size=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(UserStats.objects.get(user=self.user).posts_count, 1)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1, TIMELINE_UNPULL_LIMIT=1)
+    def test_recount_switches_pull_mode(self):
+        """recount включает и выключает подмешивание по порогам."""
+        Follow.objects.create(user=self.reader, author=self.user)
+        stats = UserStats.objects.filter(user=self.user)
+        stats.update(pulled=False)
+        call_command('recount', stdout=StringIO())
+        self.assertTrue(stats.get().pulled)
+        Follow.objects.all().delete()
+        stats.update(followers_count=1, pulled=True)
+        call_command('recount', stdout=StringIO())
+        self.assertFalse(stats.get().pulled)
+
+
+class ExcerptTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def test_excerpt_follows_text(self):
+        """Начало текста сохраняется при создании и правке поста."""
+        post = Post.objects.create(author=self.user, text='а' * 1000)
+        post.refresh_from_db()
+        self.assertEqual(len(post.excerpt), EXCERPT_LENGTH)
+        self.assertTrue(post.excerpt.endswith('…'))
+        post.text = 'Короткий текст'
+        post.save(update_fields=['text'])
+        post.refresh_from_db()
+        self.assertEqual(post.excerpt, 'Короткий текст')
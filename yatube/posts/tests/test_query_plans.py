@@ -0,0 +1,93 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class QueryPlanTest(TestCase):
+    """Запросы лент идут по индексам, без полного прохода и сортировки."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание группы'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(15):
+            post = Post.objects.create(
+                author=cls.author, text=f'Пост {i}', group=cls.group
+            )
+            Comment.objects.create(post=post, author=cls.user, text='Ком')
+        cls.post = post
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_indexed(self, url):
+        with CaptureQueriesContext(connection) as context:
+            self.authorized_client.get(url)
+        for captured in context.captured_queries:
+            sql = captured['sql']
+            if not sql.startswith('SELECT') or 'posts_' not in sql:
+                continue
+            with self.subTest(url=url, sql=sql):
+                for step in self.plan(sql):
+                    self.assertNotIn('USE TEMP B-TREE', step)
+                    self.assertNotRegex(step, r'^SCAN (TABLE )?posts_\w+$')
+
+    def test_feed_queries_use_indexes(self):
+        """Ленты и страница поста не сортируют во временном B-дереве."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            self.assert_indexed(url)
+
+    def test_deep_pages_use_indexes(self):
+        """Переход по курсору тоже идёт по индексу."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            response = self.authorized_client.get(url)
+            query = response.context['page_obj'].next_page_query
+            cache.clear()
+            self.assert_indexed(f'{url}?{query}')
+
+    def test_pull_feed_uses_indexes(self):
+        """Посты популярных авторов листаются по индексу, без сортировки."""
+        UserStats.objects.filter(user=self.author).update(pulled=True)
+        url = reverse('posts:follow_index')
+        self.assert_indexed(url)
+        response = self.authorized_client.get(url)
+        query = response.context['page_obj'].next_page_query
+        cache.clear()
+        self.assert_indexed(f'{url}?{query}')
@@ -1,20 +1,49 @@
 import shutil
 import tempfile
+import warnings
+from io import StringIO
+from unittest import mock, skipUnless
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.db import OperationalError, connection, transaction
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore
 
-from ..models import Group, Post, Follow
+from core.cache import get_versions
+from .. import (
+    cards, counts, follow_graph, search, thumbnails, timeline, writes
+)
+from ..models import (
+    Comment, Group, Post, Follow, TimelineEntry, UserStats
+)
+from ..utils import (
+    GLOBAL_SCOPE, WindowedPaginator, encode_cursor, group_scope
+)
 
 User = get_user_model()
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
 
 class ContextTest(TestCase):
     @classmethod
@@ -31,6 +60,7 @@ class ContextTest(TestCase):
             description='Тестовое описание группы'
         )
         cls.user = User.objects.create_user(username='HasNoName')
+        cls.user_second = User.objects.create_user(username='Reader')
         cls.post = Post.objects.create(
             author=cls.user,
             text='Тестовый текст.',
@@ -85,6 +115,30 @@ class ContextTest(TestCase):
             with self.subTest(obj=obj):
                 self.assertEqual(obj, answer)
 
+    def test_list_views_defer_full_text(self):
+        """Ленты читают только начало текста, страница поста — весь."""
+        Follow.objects.create(user=self.user_second, author=self.user)
+        reader = Client()
+        reader.force_login(self.user_second)
+        pages = {
+            reverse('posts:index'): self.authorized_client,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}):
+                self.authorized_client,
+            reverse('posts:profile', kwargs={'username': self.user}):
+                self.authorized_client,
+            reverse('posts:follow_index'): reader,
+        }
+        for address, client in pages.items():
+            with self.subTest(address=address):
+                response = client.get(address)
+                post = response.context['page_obj'][0]
+                self.assertIn('text', post.get_deferred_fields())
+                self.assertEqual(post.excerpt, self.post.text)
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        self.assertFalse(response.context['post'].get_deferred_fields())
+
     def test_create_post_correct_context(self):
         """Шаблон create_post сформирован с правильным контекстом."""
         response = self.authorized_client.get(reverse('posts:post_create'))
@@ -197,6 +251,8 @@ class PaginatorTest(TestCase):
                 text='Тестовый текст.',
                 group=cls.group
             )
+
+    def setUp(self):
         cache.clear()
 
     def test_paginator_for_pages(self):
@@ -221,6 +277,104 @@ class PaginatorTest(TestCase):
                     len(response.context.get('page_obj')), 3
                 )
 
+    def test_page_window(self):
+        """Выводятся номера вокруг текущей страницы и крайние."""
+        paginator = WindowedPaginator(range(100), 1, window=2)
+        self.assertEqual(
+            paginator.page(10).page_window,
+            [1, None, 8, 9, 10, 11, 12, None, 100]
+        )
+        self.assertEqual(
+            paginator.page(2).page_window, [1, 2, 3, 4, None, 100]
+        )
+        paginator = WindowedPaginator(range(5), 1, count=3, window=None)
+        self.assertEqual(paginator.page(3).page_window, [1, 2, 3])
+        self.assertEqual(len(paginator.page(3)), 1)
+
+    def test_numbered_pages_use_cached_count(self):
+        """COUNT(*) не выполняется на каждой нумерованной странице."""
+        url = reverse('posts:index')
+        self.client.get(url, {'page': 1})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'page': 2})
+        self.assertFalse(
+            [query for query in queries if 'COUNT(' in query['sql']]
+        )
+        self.assertEqual(response.context['page_obj'].paginator.count, 13)
+        Post.objects.create(author=PaginatorTest.user, text='Ещё пост.')
+        response = self.client.get(url, {'page': 2})
+        self.assertEqual(len(response.context['page_obj']), 4)
+
+    def test_stale_count_refreshed_in_background(self):
+        """После записи отдаётся прежнее число, пересчёт уходит в фон."""
+        url = reverse(
+            'posts:group_list', kwargs={'slug': PaginatorTest.group.slug}
+        )
+        self.client.get(url, {'page': 1})
+        Post.objects.create(
+            author=PaginatorTest.user, text='Ещё пост.',
+            group=PaginatorTest.group
+        )
+        with override_settings(COUNT_REFRESH_THREADS=1), mock.patch.object(
+            counts, '_get_executor'
+        ) as executor:
+            response = self.client.get(url, {'page': 2})
+        self.assertEqual(response.context['page_obj'].paginator.count, 13)
+        executor.return_value.submit.assert_called_once()
+
+    def test_count_estimate(self):
+        """Для таблицы без условий берётся оценка планировщика."""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.assertEqual(counts.estimate(Post.objects.all()), 13)
+        self.assertIsNone(
+            counts.estimate(Post.objects.filter(group=PaginatorTest.group))
+        )
+
+    def test_keyset_paginator_for_pages(self):
+        """Переход по курсорам after/before проходит ленту без пропусков."""
+        first_page = self.client.get(reverse('posts:index'))
+        page_obj = first_page.context['page_obj']
+        self.assertFalse(page_obj.has_previous())
+        self.assertTrue(page_obj.has_next())
+        response = self.client.get(
+            f'{reverse("posts:index")}?{page_obj.next_page_query}'
+        )
+        second_page = response.context['page_obj']
+        self.assertEqual(len(second_page), 3)
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(
+            set(first_page.context['page_obj']).isdisjoint(second_page)
+        )
+        response = self.client.get(
+            f'{reverse("posts:index")}?{second_page.previous_page_query}'
+        )
+        self.assertEqual(
+            list(response.context['page_obj']),
+            list(first_page.context['page_obj'])
+        )
+
+    def test_keyset_paginator_broken_cursor(self):
+        """Битый курсор возвращает первую страницу."""
+        response = self.client.get(reverse('posts:index'), {'after': '!!'})
+        self.assertEqual(
+            len(response.context['page_obj']), settings.PGN_COUNT
+        )
+
+    def test_keyset_paginator_rank_cursor_on_feed(self):
+        """Курсор с рангом вместо даты в ленте считается битым."""
+        cursor = encode_cursor(1.5, 1)
+        for address in (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        ):
+            with self.subTest(address=address):
+                response = self.client.get(address, {'after': cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    len(response.context['page_obj']), settings.PGN_COUNT
+                )
+
 
 class TemplateTest(TestCase):
     @classmethod
@@ -262,7 +416,8 @@ class TemplateTest(TestCase):
             reverse(
                 'posts:post_edit',
                 kwargs={'post_id': f'{int(TemplateTest.post.pk)}'}
-            ): 'posts/create_post.html'
+            ): 'posts/create_post.html',
+            reverse('posts:search'): 'posts/search.html'
         }
         for reverse_name, template in templates_pages_names.items():
             with self.subTest(reverse_name=reverse_name):
@@ -270,6 +425,182 @@ class TemplateTest(TestCase):
                 self.assertTemplateUsed(response, template)
 
 
+class CommentsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.post = Post.objects.create(author=cls.user, text='Текст')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            self.authorized_client.get(self.url)
+        return len(context)
+
+    def test_post_detail_queries_do_not_grow(self):
+        """Число запросов post_detail не зависит от числа комментариев."""
+        Comment.objects.create(post=self.post, author=self.user, text='1')
+        # Первый запрос кладёт пользователя в кеш.
+        self.count_queries()
+        queries = self.count_queries()
+        for i in range(10):
+            author = User.objects.create_user(username=f'commenter{i}')
+            Comment.objects.create(post=self.post, author=author, text='2')
+        self.assertEqual(self.count_queries(), queries)
+
+    def test_add_comment_waits_for_commit(self):
+        """Комментарий записан к ответу; при занятой базе — ответ 503."""
+        add_url = reverse(
+            'posts:add_comment', kwargs={'post_id': self.post.pk}
+        )
+        response = self.authorized_client.post(add_url, {'text': 'Первый'})
+        self.assertRedirects(response, self.url)
+        self.assertTrue(Comment.objects.filter(text='Первый').exists())
+        locked = OperationalError('database is locked')
+        with mock.patch.object(
+            writes.comments, 'write', side_effect=locked
+        ), mock.patch('core.writes.time.sleep') as sleep:
+            response = self.authorized_client.post(add_url, {'text': 'Нет'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(sleep.call_count, settings.WRITE_RETRY_ATTEMPTS - 1)
+        self.assertFalse(Comment.objects.filter(text='Нет').exists())
+
+    @override_settings(COMMENTS_PGN_COUNT=3)
+    def test_comments_paginated_in_order(self):
+        """Комментарии идут по времени и подгружаются порциями."""
+        for i in range(5):
+            Comment.objects.create(
+                post=self.post, author=self.user, text=f'Комментарий {i}'
+            )
+        response = self.authorized_client.get(self.url)
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            ['Комментарий 0', 'Комментарий 1', 'Комментарий 2']
+        )
+        fragment_url = reverse(
+            'posts:post_comments', kwargs={'post_id': self.post.pk}
+        )
+        response = self.authorized_client.get(
+            f'{fragment_url}?{comments.next_page_query}'
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comment_list.html')
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['Комментарий 3', 'Комментарий 4']
+        )
+
+
+@skipUnless(search.is_supported(), 'Индекс FTS5 есть только в SQLite')
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание группы'
+        )
+        cls.weak = Post.objects.create(
+            author=cls.user,
+            text='Длинный рассказ о том, как прошёл день, и немного про '
+                 'котов в самом конце'
+        )
+        cls.strong = Post.objects.create(author=cls.user, text='Коты, коты')
+        cls.other = Post.objects.create(
+            author=cls.author, text='Котята в группе', group=cls.group
+        )
+        Post.objects.create(author=cls.author, text='Про собак')
+
+    def search(self, **params):
+        response = self.client.get(reverse('posts:search'), params)
+        return response.context['page_obj']
+
+    def test_search_ranks_matches(self):
+        """Найденные посты упорядочены по релевантности, префикс работает."""
+        self.assertEqual(list(self.search(q='коты')), [self.strong])
+        self.assertEqual(
+            list(self.search(q='кот')), [self.strong, self.other, self.weak]
+        )
+
+    def test_search_filters(self):
+        """Поиск фильтруется по автору и группе."""
+        self.assertEqual(
+            list(self.search(q='кот', author=self.author.username)),
+            [self.other]
+        )
+        self.assertEqual(
+            list(self.search(q='кот', group=self.group.slug)), [self.other]
+        )
+
+    def test_index_follows_edit_and_delete(self):
+        """Индекс обновляется при правке и удалении поста."""
+        post = Post.objects.get(pk=self.strong.pk)
+        post.text = 'Теперь про собак'
+        post.save()
+        self.assertNotIn(post, self.search(q='кот'))
+        self.assertIn(post, self.search(q='собак'))
+        Post.objects.get(pk=self.other.pk).delete()
+        self.assertEqual(list(self.search(q='кот')), [self.weak])
+
+    @override_settings(PGN_COUNT=2)
+    def test_search_keyset_pagination(self):
+        """Результаты листаются курсорами без пропусков и повторов."""
+        first_page = self.search(q='кот')
+        self.assertTrue(first_page.has_next())
+        url = reverse('posts:search')
+        response = self.client.get(f'{url}?{first_page.next_page_query}')
+        second_page = response.context['page_obj']
+        self.assertEqual(list(second_page), [self.weak])
+        self.assertFalse(second_page.has_next())
+        response = self.client.get(f'{url}?{second_page.previous_page_query}')
+        self.assertEqual(
+            list(response.context['page_obj']), list(first_page)
+        )
+
+    def test_rebuild_command(self):
+        """Команда перестраивает индекс с нуля."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {search.FTS_TABLE} (rowid, text) '
+                "VALUES (1000000, 'удалённый кот')"
+            )
+        self.assertEqual(list(self.search(q='кот')), [])
+        call_command('rebuild_search_index', batch_size=2, stdout=StringIO())
+        self.assertEqual(len(self.search(q='кот')), 3)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {search.FTS_TABLE}')
+            self.assertEqual(cursor.fetchone()[0], Post.objects.count())
+
+
+class CacheCommitTest(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='HasNoName')
+        cache.clear()
+
+    def test_page_read_before_commit_is_not_reused(self):
+        """Страница, прочитанная до COMMIT записи, не остаётся в кеше."""
+        with transaction.atomic():
+            Post.objects.create(author=self.user, text='Новый пост')
+            response = self.client.get(reverse('posts:index'))
+            self.assertIsNotNone(response.context)
+        response = self.client.get(reverse('posts:index'))
+        self.assertIsNotNone(response.context)
+        response = self.client.get(reverse('posts:index'))
+        self.assertIsNone(response.context)
+
+
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class ImageTest(TestCase):
     @classmethod
@@ -391,6 +722,68 @@ class ImageTest(TestCase):
                 self.assertEqual(obj, answer)
 
 
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Текст',
+            image=SimpleUploadedFile(
+                name='thumb.gif', content=SMALL_GIF, content_type='image/gif'
+            )
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_placeholder_until_thumbnail_ready(self):
+        """Пока миниатюры нет, выводится заглушка и страница не кешируется."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'bg-light')
+        self.assertNotContains(response, 'card-img my-2" src')
+        response = self.client.get(reverse('posts:index'))
+        self.assertIsNotNone(response.context)
+        thumbnails.generate(self.post.image.name)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'card-img my-2" src')
+        self.assertNotContains(response, 'bg-light')
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_failed_thumbnail_not_resubmitted(self):
+        """Картинка, миниатюра которой не строится, не идёт в пул снова."""
+        name = self.post.image.name
+        with mock.patch.object(
+            thumbnails, 'get_thumbnail',
+            side_effect=OSError('image file is truncated')
+        ), self.assertLogs('posts.thumbnails', 'ERROR'):
+            thumbnails._submit(name)
+        with mock.patch.object(thumbnails, 'generate') as generate:
+            thumbnails._submit(name)
+        generate.assert_not_called()
+
+    def test_thumbnail_from_worker_cache(self):
+        """
+        Миниатюра, записанная процессом пула со своим кешем, видна и после
+        промаха: промах не остаётся в кеше веб-процесса.
+        """
+        self.assertIsNone(thumbnails.lookup(self.post.image, '960x339'))
+        worker_cache = LocMemCache('thumbnail-worker', {})
+        with mock.patch.object(
+            KVStore, 'cache',
+            new_callable=mock.PropertyMock, return_value=worker_cache
+        ):
+            thumbnails.generate(self.post.image.name)
+        self.assertIsNotNone(thumbnails.lookup(self.post.image, '960x339'))
+
+
 class CacheTest(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(username='HasNoName')
@@ -399,16 +792,241 @@ class CacheTest(TestCase):
         cache.clear()
 
     def test_index_contains_cash(self):
+        """Пока данные не менялись, index отдаётся из кеша."""
         post_new = Post.objects.create(
             author=self.user,
             text='Текст для теста кеширования.',
         )
         response_with = self.authorized_client.get(reverse('posts:index'))
         self.assertIn(post_new, response_with.context['page_obj'])
-        post_new.delete()
+        # update() не посылает сигналов и не сбрасывает версию ленты
+        Post.objects.filter(pk=post_new.pk).update(text='Другой текст.')
         response_without = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(response_with.content, response_without.content)
 
+    def test_cache_invalidated_on_delete(self):
+        """Удаление поста сразу сбрасывает кеш index."""
+        post_new = Post.objects.create(
+            author=self.user,
+            text='Текст для теста кеширования.',
+        )
+        response_with = self.authorized_client.get(reverse('posts:index'))
+        post_new.delete()
+        response_without = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotEqual(response_with.content, response_without.content)
+        self.assertNotIn(post_new, response_without.context['page_obj'])
+
+    def test_comment_keeps_index_cache(self):
+        """Комментарий сбрасывает ленту автора, но не общую ленту."""
+        post = Post.objects.create(author=self.user, text='Текст')
+        scopes = ['posts', 'author:HasNoName', f'post:{post.pk}']
+        before = get_versions(scopes)
+        Comment.objects.create(post=post, author=self.user, text='Ком')
+        after = get_versions(scopes)
+        self.assertEqual(after[0], before[0])
+        self.assertNotEqual(after[1:], before[1:])
+
+    def test_version_keys_accept_any_slug(self):
+        """Слаг с пробелом и не-ASCII не даёт недопустимых ключей кеша."""
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+            Group.objects.create(
+                title='Группа', slug='Тестовый слаг', description='Описание'
+            )
+            get_versions([group_scope('Тестовый слаг')])
+
+    def test_author_sees_new_post_after_create(self):
+        """Автор видит новый пост в профиле сразу после публикации."""
+        profile_url = reverse(
+            'posts:profile', kwargs={'username': self.user.username}
+        )
+        self.authorized_client.get(profile_url)
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Свежий пост'},
+            follow=True
+        )
+        self.assertEqual(
+            response.context['page_obj'][0].text, 'Свежий пост'
+        )
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.post = Post.objects.create(author=cls.user, text='Текст')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def get_etag(self, client, url):
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_not_modified_without_render(self):
+        """Пока область не менялась, страница отдаёт 304 без отрисовки."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                # Первый ответ ставит CSRF-куку, которая входит в ETag.
+                self.authorized_client.get(url)
+                etag = self.get_etag(self.authorized_client, url)
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.templates, [])
+                self.assertEqual(response['ETag'], etag)
+
+    def test_validator_is_cheap(self):
+        """Проверка ETag гостя обходится без запросов к базе."""
+        url = reverse('posts:index')
+        etag = self.get_etag(self.client, url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_with_data_and_viewer(self):
+        """ETag меняется после записи в область и для другого зрителя."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.authorized_client.get(url)
+        etag = self.get_etag(self.authorized_client, url)
+        self.assertNotEqual(self.get_etag(self.client, url), etag)
+        Comment.objects.create(post=self.post, author=self.user, text='Ком')
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_group_rename_changes_post_etag(self):
+        """Переименование группы меняет ETag страницы её поста."""
+        group = Group.objects.create(
+            title='Старое название', slug='group', description='Описание'
+        )
+        post = Post.objects.create(
+            author=self.user, group=group, text='Текст'
+        )
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        self.client.get(url)
+        etag = self.get_etag(self.client, url)
+        group.title = 'Новое название'
+        group.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Новое название')
+
+    def test_author_rename_changes_etags(self):
+        """Смена имени автора меняет ETag профиля и страницы поста."""
+        urls = [
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+        etags = {}
+        for url in urls:
+            self.client.get(url)
+            etags[url] = self.get_etag(self.client, url)
+        self.user.first_name = 'Переименованный'
+        self.user.save()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url]
+                )
+                self.assertContains(response, 'Переименованный')
+
+    def test_login_keeps_etag(self):
+        """Вход в систему не сбрасывает страницы автора."""
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        self.client.get(url)
+        etag = self.get_etag(self.client, url)
+        Client().force_login(self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class CardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='HasNoName', first_name='Имя'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание группы'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый текст', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.select_related('author', 'group').get(
+            pk=self.post.pk
+        )
+
+    def test_feeds_use_cached_cards(self):
+        """Ленты берут карточку поста из кеша."""
+        cache.set(cards.card_key(self.post), '<p>Карточка из кеша</p>')
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Карточка из кеша')
+                self.assertNotContains(response, 'Тестовый текст')
+
+    def test_card_key_changes_on_edit(self):
+        """Правка поста, автора или группы даёт карточке новый ключ."""
+        key = cards.card_key(self.post)
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertNotEqual(cards.card_key(self.post), key)
+        key = cards.card_key(self.post)
+        self.post.author.first_name = 'Другое'
+        self.assertNotEqual(cards.card_key(self.post), key)
+        key = cards.card_key(self.post)
+        self.post.group.slug = 'other_slug'
+        self.assertNotEqual(cards.card_key(self.post), key)
+
+    def test_comment_keeps_feed_cache(self):
+        """Комментарий не меняет ни карточку, ни кеш общей ленты."""
+        index = reverse('posts:index')
+        self.client.get(index)
+        key = cards.card_key(self.post)
+        versions = get_versions([GLOBAL_SCOPE])
+        Comment.objects.create(post=self.post, author=self.user, text='К')
+        post = Post.objects.select_related('author', 'group').get(
+            pk=self.post.pk
+        )
+        self.assertEqual(cards.card_key(post), key)
+        self.assertEqual(get_versions([GLOBAL_SCOPE]), versions)
+        self.assertNotContains(self.client.get(index), 'Комментариев')
+
+    def test_cards_fetched_with_one_get_many(self):
+        """Прогретая страница читает все карточки одним get_many."""
+        for i in range(3):
+            Post.objects.create(author=self.user, text=f'Пост {i}')
+        posts = list(Post.objects.select_related('author', 'group'))
+        rendered = cards.render_cards(posts)
+        with mock.patch.object(
+            cache, 'get_many', wraps=cache.get_many
+        ) as get_many, mock.patch.object(cards, 'get_template') as loader:
+            self.assertEqual(cards.render_cards(posts), rendered)
+        get_many.assert_called_once()
+        loader.assert_not_called()
+
 
 class FollowTest(TestCase):
     @classmethod
@@ -476,6 +1094,61 @@ class FollowTest(TestCase):
             ).exists()
         )
 
+    def test_follow_and_unfollow_are_idempotent(self):
+        """Повторная подписка и отписка без подписки ничего не ломают."""
+        follow_url = reverse(
+            'posts:profile_follow',
+            kwargs={'username': str(FollowTest.user_second)},
+        )
+        unfollow_url = reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': str(FollowTest.user_second)},
+        )
+        self.authorized_client.post(follow_url)
+        response = self.authorized_client.post(follow_url)
+        self.assertRedirects(response, reverse('posts:follow_index'))
+        self.assertEqual(
+            Follow.objects.filter(user=FollowTest.user).count(), 1
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=FollowTest.user_second).followers_count,
+            1
+        )
+        self.authorized_client.post(unfollow_url)
+        response = self.authorized_client.post(unfollow_url)
+        self.assertRedirects(
+            response,
+            reverse(
+                'posts:profile',
+                kwargs={'username': str(FollowTest.user_second)}
+            )
+        )
+        self.assertFalse(Follow.objects.filter(user=FollowTest.user))
+
+    def test_follow_graph_cache(self):
+        """Набор подписок читается из кеша и сбрасывается при записи."""
+        user = User.objects.get(pk=FollowTest.user.pk)
+        author_ids = [FollowTest.user_second.pk, FollowTest.user.pk]
+        self.assertFalse(
+            follow_graph.is_following(user, FollowTest.user_second.pk)
+        )
+        Follow.objects.create(user=user, author=FollowTest.user_second)
+        self.assertTrue(
+            follow_graph.is_following(user, FollowTest.user_second.pk)
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                follow_graph.followed_among(user, author_ids),
+                {FollowTest.user_second.pk}
+            )
+        response = self.authorized_client.get(
+            reverse(
+                'posts:profile',
+                kwargs={'username': str(FollowTest.user_second)}
+            )
+        )
+        self.assertTrue(response.context['following'])
+
     def test_follow_index(self):
         """
         Новая запись пользователя появляется в ленте тех, кто на него подписан
@@ -500,3 +1173,130 @@ class FollowTest(TestCase):
             new_post, response_new_user.context['page_obj'].object_list
         )
         self.assertNotIn(new_post, response.context['page_obj'].object_list)
+
+    def test_follow_index_queries(self):
+        """Курсоры ленты не дочитывают отложенные поля отдельно."""
+        Follow.objects.create(
+            user=FollowTest.user, author=FollowTest.user_second
+        )
+        for i in range(3):
+            Post.objects.create(author=FollowTest.user_second, text=f'{i}')
+        url = reverse('posts:follow_index')
+        self.authorized_client.get(url)
+        with self.assertNumQueries(2):
+            self.authorized_client.get(url)
+
+    def test_follow_backfill_and_prune(self):
+        """
+        При подписке в ленту попадают прежние посты автора, при отписке
+        они из неё удаляются.
+        """
+        self.authorized_client.post(
+            reverse(
+                'posts:profile_follow',
+                kwargs={'username': str(FollowTest.user_second)},
+            )
+        )
+        old_post = Post.objects.create(
+            author=FollowTest.user_second,
+            text='Пост до подписки.',
+        )
+        Follow.objects.filter(user=FollowTest.user).delete()
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=FollowTest.user).exists()
+        )
+        self.authorized_client.post(
+            reverse(
+                'posts:profile_follow',
+                kwargs={'username': str(FollowTest.user_second)},
+            )
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(old_post, response.context['page_obj'].object_list)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_follow_index_after_author_unpulled(self):
+        """Когда автор теряет популярность, его посты остаются в ленте."""
+        reader = User.objects.create_user(username='reader')
+        for user in (FollowTest.user, reader):
+            Follow.objects.create(user=user, author=FollowTest.user_second)
+        new_post = Post.objects.create(
+            author=FollowTest.user_second,
+            text='Пост популярного автора.',
+        )
+        Follow.objects.filter(user=reader).delete()
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=FollowTest.user, post=new_post
+            ).exists()
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(new_post, response.context['page_obj'].object_list)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=3, TIMELINE_UNPULL_LIMIT=2)
+    def test_unpull_has_hysteresis(self):
+        """Автор у порога не достраивает ленты при каждой отписке."""
+        readers = [FollowTest.user] + [
+            User.objects.create_user(username=f'reader{i}') for i in range(2)
+        ]
+        for reader in readers:
+            Follow.objects.create(user=reader, author=FollowTest.user_second)
+        stats = UserStats.objects.filter(user=FollowTest.user_second)
+        self.assertTrue(stats.get().pulled)
+        with mock.patch.object(
+            timeline, 'refill', wraps=timeline.refill
+        ) as refill:
+            for reader in readers[:0:-1]:
+                Follow.objects.filter(user=reader).delete()
+                Follow.objects.create(
+                    user=reader, author=FollowTest.user_second
+                )
+                Follow.objects.filter(user=reader).delete()
+            refill.assert_called_once_with(
+                authors=[FollowTest.user_second.pk]
+            )
+        self.assertFalse(stats.get().pulled)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2, PGN_COUNT=2)
+    def test_follow_index_merges_sources(self):
+        """Лента с популярным автором листается без пропусков и повторов."""
+        popular = User.objects.create_user(username='popular')
+        regular = User.objects.create_user(username='regular')
+        Follow.objects.create(user=FollowTest.user, author=regular)
+        Follow.objects.create(user=FollowTest.user, author=popular)
+        Follow.objects.create(user=FollowTest.user_second, author=popular)
+        posts = [
+            Post.objects.create(author=author, text=f'Пост {i}')
+            for i, author in enumerate([popular, regular] * 3)
+        ]
+        url = reverse('posts:follow_index')
+        seen, query = [], ''
+        while True:
+            page_obj = self.authorized_client.get(
+                f'{url}?{query}'
+            ).context['page_obj']
+            seen += list(page_obj)
+            if not page_obj.has_next():
+                break
+            query = page_obj.next_page_query
+        self.assertEqual(seen, posts[::-1])
+        page_obj = self.authorized_client.get(
+            f'{url}?{page_obj.previous_page_query}'
+        ).context['page_obj']
+        self.assertEqual(list(page_obj), posts[3:1:-1])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_follow_index_pull_author(self):
+        """Посты популярного автора подмешиваются в ленту при чтении."""
+        Follow.objects.create(
+            user=FollowTest.user, author=FollowTest.user_second
+        )
+        new_post = Post.objects.create(
+            author=FollowTest.user_second,
+            text='Пост популярного автора.',
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=new_post).exists()
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(new_post, response.context['page_obj'].object_list)
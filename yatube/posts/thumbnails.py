@@ -0,0 +1,128 @@
+"""
+Миниатюры картинок постов считаются заранее, в пуле процессов вне
+запроса. Шаблоны только читают готовую миниатюру из хранилища sorl и,
+пока её нет, показывают заглушку.
+"""
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .images import image_file
+
+logger = logging.getLogger(__name__)
+
+# Все размеры, которые используют шаблоны постов.
+GEOMETRIES = {
+    '960x339': {'crop': 'center', 'upscale': True},
+}
+PENDING_PREFIX = 'thumbnail-pending:'
+FAILED = 'failed'
+
+_executor = None
+
+
+class PrecomputedBackend(ThumbnailBackend):
+    def lookup(self, file_, geometry_string, **options):
+        """Готовая миниатюра из хранилища sorl или None, без генерации."""
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return stored(ImageFile(name, default.storage))
+
+
+def stored(image_file):
+    """
+    Запись о миниатюре из KVStore sorl. Промах не кешируется, как в
+    kvstore.get(): миниатюру записывает процесс пула, и запись в его кеше
+    до этого процесса не дойдёт, а строка в базе — дойдёт.
+    """
+    kvstore = default.kvstore
+    key = add_prefix(image_file.key)
+    value = kvstore.cache.get(key)
+    if value is None or value == EMPTY_VALUE:
+        value = KVStoreModel.objects.filter(key=key).values_list(
+            'value', flat=True
+        ).first()
+        if value is None:
+            return None
+        kvstore.cache.set(
+            key, value, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+        )
+    return deserialize_image_file(value)
+
+
+backend = PrecomputedBackend()
+
+
+def lookup(image, geometry):
+    if not image:
+        return None
+    return backend.lookup(image, geometry, **GEOMETRIES[geometry])
+
+
+def generate(name):
+    """Считает все миниатюры картинки; выполняется в процессе пула."""
+    try:
+        for geometry, options in GEOMETRIES.items():
+            get_thumbnail(image_file(name), geometry, **options)
+    except Exception:
+        logger.exception('Не удалось построить миниатюры для %s', name)
+        # Битая картинка не станет целой: до новой попытки отметка
+        # держится дольше, чтобы каждый показ не слал её в пул заново.
+        cache.set(
+            PENDING_PREFIX + name, FAILED, settings.THUMBNAIL_FAILED_TIMEOUT
+        )
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker
+        )
+    return _executor
+
+
+def _submit(name):
+    # Один и тот же файл не ставится в очередь повторно, пока ждёт своей
+    # очереди, считается или недавно не удался.
+    if not cache.add(PENDING_PREFIX + name, True,
+                     settings.THUMBNAIL_PENDING_TIMEOUT):
+        return
+    if settings.THUMBNAIL_WORKERS:
+        _get_executor().submit(generate, name)
+    else:
+        generate(name)
+
+
+def enqueue(image):
+    """Ставит картинку в очередь после фиксации транзакции."""
+    if image:
+        name = image.name
+        transaction.on_commit(lambda: _submit(name))
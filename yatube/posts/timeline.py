@@ -0,0 +1,265 @@
+"""
+Материализованная лента подписок: новый пост раскладывается по лентам
+подписчиков при записи (fan-out on write), и чтение «Избранных авторов»
+сводится к одному проходу по индексу (user, -created).
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from . import counts
+from .models import Follow, Post, TimelineEntry, UserStats
+from .utils import (
+    KeysetPaginator, MergedKeysetPaginator, chunks, list_projection, paginate
+)
+
+BATCH_SIZE = 500
+
+
+def is_pull_author(author_id):
+    return UserStats.objects.filter(user_id=author_id, pulled=True).exists()
+
+
+def unpull_limit():
+    # Порог выключения не выше порога включения, даже если в настройках
+    # (например, в тестах) поменяли только TIMELINE_FANOUT_LIMIT.
+    return min(
+        settings.TIMELINE_UNPULL_LIMIT, settings.TIMELINE_FANOUT_LIMIT
+    )
+
+
+def fan_out(post):
+    if is_pull_author(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post.pk,
+                author_id=post.author_id,
+                created=post.created
+            )
+            for user_id in followers.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def backfill(follow):
+    if is_pull_author(follow.author_id):
+        return
+    latest = Post.objects.filter(
+        author_id=follow.author_id
+    ).order_by('-created').values_list('pk', 'created')
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=follow.user_id,
+                post_id=post_id,
+                author_id=follow.author_id,
+                created=created
+            )
+            for post_id, created in latest[:settings.TIMELINE_BACKFILL]
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def fan_out_many(post_ids):
+    """fan_out для пачки постов, записанных в обход сигналов."""
+    posts = Post.objects.filter(pk__in=post_ids).exclude(
+        author__stats__pulled=True
+    ).values_list('pk', 'author_id', 'created')
+    followers = {}
+    for author_id, user_id in Follow.objects.filter(
+        author_id__in={author_id for _, author_id, _ in posts}
+    ).values_list('author_id', 'user_id'):
+        followers.setdefault(author_id, []).append(user_id)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                created=created
+            )
+            for post_id, author_id, created in posts
+            for user_id in followers.get(author_id, ())
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def backfill_many(follows):
+    """backfill для пачки подписок, записанных в обход сигналов."""
+    pulled = set(UserStats.objects.filter(
+        user_id__in={follow.author_id for follow in follows},
+        pulled=True
+    ).values_list('user_id', flat=True))
+    TimelineEntry.objects.bulk_create(
+        _entries(sorted(
+            (follow.author_id, follow.user_id) for follow in follows
+            if follow.author_id not in pulled
+        )),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def prune(follow):
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id, author_id=follow.author_id
+    ).delete()
+
+
+def _entries(follows):
+    author_id, latest = None, []
+    for follow_author_id, user_id in follows:
+        if follow_author_id != author_id:
+            author_id = follow_author_id
+            latest = list(Post.objects.filter(
+                author_id=author_id
+            ).order_by('-created').values_list(
+                'pk', 'created'
+            )[:settings.TIMELINE_BACKFILL])
+        for post_id, created in latest:
+            yield TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                created=created
+            )
+
+
+def refill(batch_size=BATCH_SIZE, authors=None):
+    """
+    Достраивает ленты после записи в обход сигналов (bulk_create), как
+    если бы все подписки оформлялись по одной; authors ограничивает
+    подписками на этих авторов. Возвращает число записей, отправленных
+    в базу; уже существующие пропускаются.
+    """
+    stats = UserStats.objects.filter(pulled=True)
+    follows = Follow.objects.all()
+    if authors is not None:
+        stats = stats.filter(user_id__in=authors)
+        follows = follows.filter(author_id__in=authors)
+    pulled = set(stats.values_list('user_id', flat=True))
+    follows = follows.exclude(author_id__in=pulled).order_by(
+        'author_id'
+    ).values_list('author_id', 'user_id')
+    total = 0
+    for chunk in chunks(_entries(follows.iterator()), batch_size):
+        with transaction.atomic():
+            TimelineEntry.objects.bulk_create(chunk, ignore_conflicts=True)
+        total += len(chunk)
+    return total
+
+
+def pull(author_ids):
+    """
+    Авторы, набравшие TIMELINE_FANOUT_LIMIT подписчиков, переходят на
+    подмешивание при чтении.
+    """
+    UserStats.objects.filter(
+        user_id__in=author_ids,
+        pulled=False,
+        followers_count__gte=settings.TIMELINE_FANOUT_LIMIT
+    ).update(pulled=True)
+
+
+def unpull(author_id):
+    """
+    Автор опустился ниже TIMELINE_UNPULL_LIMIT: читатели снова берут его
+    посты из TimelineEntry, а их там нет, пока он был популярным. Между
+    двумя порогами автор остаётся, каким был, поэтому отписки и подписки
+    у границы не достраивают ленты каждый раз.
+    """
+    if UserStats.objects.filter(
+        user_id=author_id,
+        pulled=True,
+        followers_count__lt=unpull_limit()
+    ).update(pulled=False):
+        refill(authors=[author_id])
+
+
+def pull_authors(user):
+    return Follow.objects.filter(
+        user=user, author__stats__pulled=True
+    ).values_list('author_id', flat=True)
+
+
+def feed_sources(user, pulled=None):
+    """
+    Источники ленты подписок: тройки (запрос, ключи сортировки, префикс
+    полей поста). Первый — строки TimelineEntry, за ним посты каждого
+    автора с подмешиванием (pull_authors). Каждый листается по своему
+    индексу, а страница собирается слиянием: один запрос с OR сортировал
+    бы все посты популярных авторов.
+    """
+    if pulled is None:
+        pulled = list(pull_authors(user))
+    # Записи, разложенные, пока автор ещё не был популярным, придут с его
+    # постами: источники не должны пересекаться.
+    entries = TimelineEntry.objects.filter(user=user).exclude(
+        author_id__in=pulled
+    )
+    return [(entries, ('created', 'post_id'), 'post__')] + [
+        (Post.objects.filter(author_id=author_id), ('created', 'pk'), '')
+        for author_id in pulled
+    ]
+
+
+def _post(prefix):
+    if prefix:
+        return lambda entry: entry.post
+    return lambda post: post
+
+
+def _numbered_page(request, user, pulled):
+    # Нумерованные страницы (?page=N) — редкий путь: лента здесь одним
+    # запросом, как и у прочих лент с OFFSET.
+    if pulled:
+        entries = TimelineEntry.objects.filter(user=user).values('post_id')
+        queryset, keys, prefix = (
+            Post.objects.filter(Q(pk__in=entries) | Q(author_id__in=pulled)),
+            ('created', 'pk'),
+            ''
+        )
+    else:
+        [(queryset, keys, prefix)] = feed_sources(user, pulled)
+    queryset = list_projection(queryset, prefix, keys)
+    page_obj = paginate(
+        request, queryset, keys=keys,
+        count=lambda: counts.cached_count(f'feed:{user.pk}', queryset)
+    )
+    page_obj.object_list = list(map(_post(prefix), page_obj.object_list))
+    return page_obj
+
+
+def feed_page(request):
+    """Страница ленты подписок текущего пользователя."""
+    user = request.user
+    pulled = list(pull_authors(user))
+    if 'page' in request.GET:
+        return _numbered_page(request, user, pulled)
+    paginator = MergedKeysetPaginator(
+        [
+            (
+                KeysetPaginator(
+                    list_projection(queryset, prefix, keys),
+                    settings.PGN_COUNT,
+                    keys
+                ),
+                _post(prefix)
+            )
+            for queryset, keys, prefix in feed_sources(user, pulled)
+        ],
+        settings.PGN_COUNT
+    )
+    return paginator.get_page(request, **paginator.cursors(request))
@@ -1,8 +1,348 @@
-from django.core.paginator import Paginator
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from itertools import islice
+
 from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+CURSOR_PARAMS = ('after', 'before')
+
+GLOBAL_SCOPE = 'posts'
+
+# Поля поста, которые нужны карточке в лентах: вместо полного текста —
+# excerpt, от автора и группы — только выводимые поля.
+LIST_FIELDS = (
+    'excerpt', 'created', 'image',
+    'author', 'author__username', 'author__first_name', 'author__last_name',
+    'group', 'group__slug', 'group__title',
+)
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def encode_cursor(order_value, pk):
+    if hasattr(order_value, 'isoformat'):
+        order_value = order_value.isoformat()
+    raw = f'{order_value}|{pk}'.encode()
+    return urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def parse_rank(value):
+    return float(value)
+
+
+def decode_cursor(token, parse_order=parse_datetime):
+    """
+    Возвращает пару (первый ключ, pk) или None для битого курсора.
+    parse_order разбирает первый ключ: дату лент (по умолчанию) или ранг
+    поиска (parse_rank); ключ другого типа делает курсор битым.
+    """
+    try:
+        raw = urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        order_value, pk = raw.split('|')
+        pk = int(pk)
+        order_value = parse_order(order_value)
+    except (Base64Error, UnicodeDecodeError, ValueError):
+        return None
+    if order_value is None:
+        return None
+    return order_value, pk
+
+
+def _querystring(request, **params):
+    query = request.GET.copy()
+    for name in CURSOR_PARAMS + ('page',):
+        query.pop(name, None)
+    query.update(params)
+    return query.urlencode()
+
+
+class KeysetPage:
+    """Страница, выбранная по курсору (created, pk)."""
+    is_keyset = True
+
+    def __init__(self, object_list, request, has_next, has_previous,
+                 first_cursor, last_cursor):
+        self.object_list = object_list
+        self.request = request
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self._first_cursor = first_cursor
+        self._last_cursor = last_cursor
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def first_page_query(self):
+        return _querystring(self.request)
+
+    @property
+    def next_page_query(self):
+        return _querystring(self.request, after=self._last_cursor)
+
+    @property
+    def previous_page_query(self):
+        return _querystring(self.request, before=self._first_cursor)
+
 
+class KeysetPaginator:
+    """
+    Постраничный вывод без OFFSET и COUNT(*): каждая страница выбирается
+    условием по паре (created, pk) последней показанной записи, поэтому
+    N-я страница стоит столько же, сколько первая.
+    """
+    # Первый ключ всех лент — дата; курсор с другим ключом битый.
+    parse_order = staticmethod(parse_datetime)
 
-def paginate(request, post_list):
-    paginator = Paginator(post_list, settings.PGN_COUNT)
+    def __init__(self, object_list, per_page, keys=('created', 'pk'),
+                 descending=True):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.keys = keys
+        self.descending = descending
+
+    def cursors(self, request):
+        return get_cursors(request, self.parse_order)
+
+    def _seek(self, cursor, lookup):
+        (order_key, tie_key), (order_value, tie_value) = self.keys, cursor
+        # Граница {order_key}__{lookup}e даёт планировщику диапазон по
+        # индексу, дизъюнкция отсекает равные значения по второму ключу.
+        return self.object_list.filter(
+            Q(**{f'{order_key}__{lookup}e': order_value}),
+            Q(**{f'{order_key}__{lookup}': order_value})
+            | Q(**{order_key: order_value, f'{tie_key}__{lookup}': tie_value})
+        )
+
+    def _ordered(self, queryset, reverse=False):
+        sign = '-' if self.descending != reverse else ''
+        return queryset.order_by(*(sign + key for key in self.keys))
+
+    def _fetch(self, queryset):
+        rows = list(queryset[:self.per_page + 1])
+        return rows[:self.per_page], len(rows) > self.per_page
+
+    def _key(self, row):
+        if isinstance(row, dict):
+            return tuple(row[key] for key in self.keys)
+        return tuple(getattr(row, key) for key in self.keys)
+
+    def _cursor(self, row):
+        return encode_cursor(*self._key(row))
+
+    def _page(self, rows, request, has_next, has_previous):
+        return KeysetPage(
+            rows, request, has_next, has_previous,
+            self._cursor(rows[0]) if rows else None,
+            self._cursor(rows[-1]) if rows else None,
+        )
+
+    def select(self, after=None, before=None):
+        """
+        Записи после курсора after или, в обратном порядке, перед
+        before; без курсоров — с начала.
+        """
+        forward, backward = ('lt', 'gt') if self.descending else ('gt', 'lt')
+        if before is not None:
+            return self._ordered(self._seek(before, backward), reverse=True)
+        if after is not None:
+            return self._ordered(self._seek(after, forward))
+        return self._ordered(self.object_list)
+
+    def get_page(self, request, after=None, before=None):
+        if before is not None:
+            rows, has_previous = self._fetch(self.select(before=before))
+            if rows:
+                rows.reverse()
+                return self._page(rows, request, True, has_previous)
+        elif after is not None:
+            rows, has_next = self._fetch(self.select(after=after))
+            if rows:
+                return self._page(rows, request, has_next, True)
+        rows, has_next = self._fetch(self.select())
+        return self._page(rows, request, has_next, False)
+
+
+class MergedKeysetPaginator:
+    """
+    Лента из нескольких непересекающихся источников с общим порядком:
+    каждый KeysetPaginator выбирает не больше страницы по своему индексу,
+    а страница собирается слиянием. sources — пары (paginator, convert),
+    convert превращает строку источника в запись страницы.
+    """
+    parse_order = staticmethod(parse_datetime)
+
+    def __init__(self, sources, per_page):
+        self.sources = sources
+        self.per_page = per_page
+        self.descending = sources[0][0].descending
+
+    def cursors(self, request):
+        return get_cursors(request, self.parse_order)
+
+    def _fetch(self, after=None, before=None):
+        keyed, more = [], False
+        for paginator, convert in self.sources:
+            rows, has_more = paginator._fetch(
+                paginator.select(after, before)
+            )
+            keyed += [(paginator._key(row), convert(row)) for row in rows]
+            more = more or has_more
+        keyed.sort(
+            key=lambda item: item[0],
+            reverse=self.descending != (before is not None)
+        )
+        return keyed[:self.per_page], more or len(keyed) > self.per_page
+
+    def _page(self, keyed, request, has_next, has_previous):
+        return KeysetPage(
+            [row for _, row in keyed], request, has_next, has_previous,
+            encode_cursor(*keyed[0][0]) if keyed else None,
+            encode_cursor(*keyed[-1][0]) if keyed else None,
+        )
+
+    def get_page(self, request, after=None, before=None):
+        if before is not None:
+            keyed, has_previous = self._fetch(before=before)
+            if keyed:
+                keyed.reverse()
+                return self._page(keyed, request, True, has_previous)
+        elif after is not None:
+            keyed, has_next = self._fetch(after=after)
+            if keyed:
+                return self._page(keyed, request, has_next, True)
+        keyed, has_next = self._fetch()
+        return self._page(keyed, request, has_next, False)
+
+
+class WindowedPaginator(Paginator):
+    """
+    Нумерованные страницы: выводятся номера вокруг текущей и крайние,
+    а число записей берётся из count (число или функция), если он задан,
+    вместо COUNT(*) на каждый запрос.
+    """
+
+    def __init__(self, object_list, per_page, count=None, window=None):
+        super().__init__(object_list, per_page)
+        self.count_source = count
+        self.window = window
+
+    @cached_property
+    def count(self):
+        if self.count_source is None:
+            return super().count
+        if callable(self.count_source):
+            return self.count_source()
+        return self.count_source
+
+    def page_window(self, number):
+        """Номера страниц для вывода; None — пропуск между ними."""
+        last = self.num_pages
+        if self.window is None:
+            return list(self.page_range)
+        start = max(number - self.window, 1)
+        end = min(number + self.window, last)
+        pages = list(range(start, end + 1))
+        if start > 1:
+            pages[:0] = [1, None] if start > 2 else [1]
+        if end < last:
+            pages += [None, last] if end < last - 1 else [last]
+        return pages
+
+    def page(self, number):
+        # Число записей может отставать от таблицы, поэтому срез по нему
+        # не обрезается: страница всегда полная, если записи есть.
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        page = self._get_page(
+            self.object_list[bottom:bottom + self.per_page], number, self
+        )
+        page.page_window = self.page_window(number)
+        return page
+
+
+def list_projection(queryset, prefix='', keys=()):
+    """
+    Узкая выборка для ленты: LIST_FIELDS поста, к которому ведёт prefix
+    (например, 'post__' для строк TimelineEntry), и ключи сортировки keys
+    самих строк: отложенный ключ читался бы для курсора отдельным
+    запросом. Полный текст читается только на странице поста.
+    """
+    fields = [prefix + name for name in LIST_FIELDS]
+    fields += [key for key in keys if key != 'pk']
+    if prefix:
+        fields.append(prefix.rstrip('_'))
+    return queryset.select_related(
+        f'{prefix}author', f'{prefix}group'
+    ).only(*fields)
+
+
+def get_cursors(request, parse_order=parse_datetime):
+    return {
+        name: decode_cursor(request.GET[name], parse_order)
+        for name in CURSOR_PARAMS if name in request.GET
+    }
+
+
+def paginate(request, post_list, keys=('created', 'pk'), count=None):
+    """
+    Страница ленты: по курсорам, а с ?page=N — нумерованная. count —
+    число записей или функция, которая его вернёт, для нумерованных
+    страниц (см. posts.counts); без него считается COUNT(*).
+    """
     page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+    if page_number is not None:
+        paginator = WindowedPaginator(
+            post_list, settings.PGN_COUNT, count, settings.PGN_WINDOW
+        )
+        return paginator.get_page(page_number)
+    paginator = KeysetPaginator(post_list, settings.PGN_COUNT, keys)
+    return paginator.get_page(request, **paginator.cursors(request))
+
+
+def paginate_comments(request, post):
+    paginator = KeysetPaginator(
+        post.comments.select_related('author'),
+        settings.COMMENTS_PGN_COUNT,
+        descending=False
+    )
+    return paginator.get_page(request, **paginator.cursors(request))
+
+
+def chunks(iterable, size):
+    """Элементы iterable списками по size штук, не читая всё сразу."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
@@ -1,25 +1,44 @@
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, get_object_or_404, redirect
-from django.views.decorators.cache import cache_page
 
+from core.cache import cache_page_versioned
+from core.routers import replica_reads
+from core.writes import unavailable_on_contention
+from . import (
+    counts, follow_graph, search as post_search, thumbnails, timeline, writes
+)
 from .forms import PostForm, CommentForm
-from .models import Post, Group, User, Follow
-from .utils import paginate
+from .models import Post, Group, User
+from .utils import (
+    GLOBAL_SCOPE, author_scope, group_scope, list_projection,
+    paginate, paginate_comments, post_scope
+)
 
 
-@cache_page(20)
+@cache_page_versioned(lambda request: [GLOBAL_SCOPE])
+@replica_reads
 def index(request):
-    post_list = Post.objects.select_related('group', 'author').all()
-    page_obj = paginate(request, post_list)
+    post_list = list_projection(Post.objects.all())
+    page_obj = paginate(request, post_list, count=lambda: counts.cached_count(
+        'posts', Post.objects.all(), [GLOBAL_SCOPE]
+    ))
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+@cache_page_versioned(lambda request, slug: [group_scope(slug)])
+@replica_reads
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    page_obj = paginate(request, group.posts.select_related('group', 'author'))
+    page_obj = paginate(
+        request,
+        list_projection(group.posts.all()),
+        count=lambda: counts.cached_count(
+            f'group:{group.pk}', group.posts.all(), [group_scope(slug)]
+        )
+    )
     context = {
         'group': group,
         'page_obj': page_obj
@@ -27,13 +46,17 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@cache_page_versioned(lambda request, username: [author_scope(username)])
+@replica_reads
 def profile(request, username):
-    user = get_object_or_404(User, username=username)
-    post_list = user.posts.select_related('author', 'group')
-    page_obj = paginate(request, post_list)
-    following = request.user.is_authenticated and Follow.objects.filter(
-        user=request.user, author=user
-    ).exists()
+    user = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    post_list = list_projection(user.posts.all())
+    # Число постов автора уже есть в денормализованных счётчиках.
+    stats = getattr(user, 'stats', None)
+    page_obj = paginate(request, post_list, count=stats and stats.posts_count)
+    following = follow_graph.is_following(request.user, user.pk)
 
     context = {
         'author': user,
@@ -43,25 +66,71 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    author = group = None
+    if request.GET.get('author'):
+        author = get_object_or_404(User, username=request.GET['author'])
+    if request.GET.get('group'):
+        group = get_object_or_404(Group, slug=request.GET['group'])
+    page_obj = None
+    if query:
+        page_obj = post_search.search_page(request, query, author, group)
+    context = {
+        'query': query,
+        'author': author,
+        'group': group,
+        'page_obj': page_obj
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def post_detail_scopes(request, post_id):
+    # На странице поста есть и число постов автора, и название группы.
+    username, slug = Post.objects.filter(pk=post_id).values_list(
+        'author__username', 'group__slug'
+    ).first() or (None, None)
+    scopes = [post_scope(post_id), author_scope(username or '')]
+    if slug:
+        scopes.append(group_scope(slug))
+    return scopes
+
+
+# Форма комментария несёт CSRF-токен, поэтому сама страница не кешируется.
+@cache_page_versioned(post_detail_scopes, cache_pages=False)
+@replica_reads
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
     context = {
         'post': post,
         'form': CommentForm(),
-        'comments': comments
+        'comments': paginate_comments(request, post)
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    context = {
+        'post': post,
+        'comments': paginate_comments(request, post),
+        'fragment': True
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
 @login_required
+@unavailable_on_contention
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if request.method == 'POST':
         if form.is_valid():
             post = form.save(commit=False)
             post.author = request.user
-            post.save()
+            writes.create_post(post)
+            thumbnails.enqueue(post.image)
             return redirect('posts:profile', username=post.author)
 
     context = {
@@ -71,6 +140,7 @@ def post_create(request):
 
 
 @login_required
+@unavailable_on_contention
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     if request.user != post.author:
@@ -81,7 +151,9 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        writes.save_form(form)
+        if 'image' in form.changed_data:
+            thumbnails.enqueue(post.image)
         return redirect('posts:post_detail', post_id)
     context = {
         'form': form,
@@ -91,21 +163,22 @@ def post_edit(request, post_id):
 
 
 @login_required
+@unavailable_on_contention
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        writes.create_comment(comment)
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
+@replica_reads
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginate(request, post_list)
+    page_obj = timeline.feed_page(request)
     context = {
         'page_obj': page_obj
     }
@@ -113,23 +186,17 @@ def follow_index(request):
 
 
 @login_required
+@unavailable_on_contention
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    if author == request.user:
-        return redirect('posts:follow_index')
-    if Follow.objects.filter(user=request.user, author=author).exists():
-        return redirect('posts:follow_index')
-    Follow.objects.create(
-        user=request.user,
-        author=author
-    )
+    if author != request.user:
+        writes.follow(request.user, author)
     return redirect('posts:follow_index')
 
 
 @login_required
+@unavailable_on_contention
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    user = request.user
-    if Follow.objects.filter(user=user, author=author).exists():
-        Follow.objects.filter(user=user, author=author).delete()
-        return redirect('posts:profile', username=username)
+    writes.unfollow(request.user, author)
+    return redirect('posts:profile', username=username)
@@ -0,0 +1,30 @@
+"""
+Записи из представлений posts через core.writes: повтор транзакции при
+занятой базе, а комментарии из одновременных запросов — одной
+транзакцией на пачку.
+"""
+from core import writes
+from . import follow_graph
+
+comments = writes.Batcher(writes.save_new)
+
+
+def create_post(post):
+    return writes.run(writes.save_new, post)
+
+
+def save_form(form):
+    return writes.run(form.save)
+
+
+def create_comment(comment):
+    """Сохраняет комментарий; возвращается после фиксации транзакции."""
+    return comments.submit(comment)
+
+
+def follow(user, author):
+    return writes.run(follow_graph.follow, user, author)
+
+
+def unfollow(user, author):
+    return writes.run(follow_graph.unfollow, user, author)
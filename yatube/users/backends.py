@@ -0,0 +1,30 @@
+"""
+ModelBackend, который держит пользователя в кеше: AuthenticationMiddleware
+не ходит за ним в базу на каждом запросе. Запись сбрасывается при
+сохранении пользователя (users.signals), в том числе при смене пароля.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+KEY_PREFIX = 'auth_user:'
+
+
+def user_key(user_id):
+    return f'{KEY_PREFIX}{user_id}'
+
+
+def forget_user(user_id):
+    cache.delete(user_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        key = user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+            return user
+        return user if self.user_can_authenticate(user) else None
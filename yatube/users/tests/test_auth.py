@@ -0,0 +1,58 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..backends import user_key
+
+User = get_user_model()
+PASSWORD = 'Old-secret-42'
+
+
+class CachedAuthTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='reader', password=PASSWORD
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.login(username='reader', password=PASSWORD)
+
+    def test_no_session_or_user_queries(self):
+        """Сессия и пользователь залогиненного запроса берутся из кеша."""
+        self.client.get(reverse('posts:follow_index'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['user'], self.user)
+        statements = [query['sql'] for query in queries]
+        self.assertFalse(
+            [sql for sql in statements if 'django_session' in sql]
+        )
+        self.assertFalse([
+            sql for sql in statements
+            if sql.startswith('SELECT') and 'FROM "auth_user" WHERE' in sql
+        ])
+
+    def test_password_change_resets_cached_user(self):
+        """После смены пароля другие сессии пользователя закрываются."""
+        other = Client()
+        other.login(username='reader', password=PASSWORD)
+        other.get(reverse('posts:follow_index'))
+        self.assertIsNotNone(cache.get(user_key(self.user.pk)))
+        response = self.client.post(reverse('users:password_change'), {
+            'old_password': PASSWORD,
+            'new_password1': 'New-secret-43',
+            'new_password2': 'New-secret-43',
+        })
+        self.assertRedirects(response, reverse('users:password_change_done'))
+        self.assertEqual(
+            self.client.get(reverse('posts:follow_index')).status_code, 200
+        )
+        response = other.get(reverse('posts:follow_index'))
+        self.assertEqual(response.status_code, 302)
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import sys
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -45,27 +46,46 @@ INSTALLED_APPS = [
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
+    'api.apps.ApiConfig',
+    'benchmarks.apps.BenchmarksConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.FirstRequestMiddleware',
+    'core.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ViewTimingMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# В боевом режиме шаблоны разбираются один раз на процесс и хранятся
+# в cached.Loader; при TEMPLATE_WARMUP процесс разбирает все шаблоны
+# проекта ещё до первого запроса (yatube.wsgi, core.warmup).
+TEMPLATE_CACHED = not DEBUG
+TEMPLATE_WARMUP = TEMPLATE_CACHED
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if TEMPLATE_CACHED:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.instrumentation.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -87,9 +107,65 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение живёт между запросами, и PRAGMA из SQLITE_PRAGMAS
+        # выполняются раз на соединение. При отладке — на каждый запрос.
+        'CONN_MAX_AGE': 0 if DEBUG else 10 * 60,
+        'OPTIONS': {
+            # Сколько секунд ждать занятую другим писателем базу.
+            'timeout': 20,
+        },
     }
 }
 
+# PRAGMA для каждого нового соединения с SQLite (core.db). Журнал WAL
+# сохраняется в файле базы; остальное действует в пределах соединения.
+# Пустой словарь — настройки SQLite по умолчанию.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    # Миллисекунды; то же, что OPTIONS['timeout'].
+    'busy_timeout': 20 * 1000,
+    # Отрицательное значение — в КиБ: 64 МиБ кеша страниц на соединение.
+    'cache_size': -64 * 1024,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+# Реплики только для чтения (core.routers): псевдонимы в DATABASES. Для
+# проверки на одной машине — копии db.sqlite3, которые обновляет команда
+# sync_replicas; 0 — без реплик.
+SQLITE_REPLICAS = 0
+REPLICA_DATABASES = [f'replica{index}' for index in range(1, SQLITE_REPLICAS + 1)]
+for alias in REPLICA_DATABASES:
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': os.path.join(BASE_DIR, f'db-{alias}.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Реплика, отставшая больше чем на столько секунд, пропускается.
+REPLICA_MAX_LAG = 5
+# Как часто процесс перечитывает отметку синхронизации каждой реплики.
+REPLICA_CHECK_INTERVAL = 1
+# После записи сессия столько секунд читает только основную базу.
+REPLICA_PIN_SECONDS = 10
+REPLICA_PIN_COOKIE = 'replica_pin'
+
+# Сессии: 'db' — только в базе, 'cached_db' — чтение из кеша с записью
+# и в базу, 'signed_cookies' — в подписанной куке без базы и кеша.
+SESSION_MODE = 'cached_db'
+SESSION_ENGINE = f'django.contrib.sessions.backends.{SESSION_MODE}'
+
+# Пользователь запроса берётся из кеша (users.backends) и сбрасывается
+# при сохранении. ModelBackend остаётся в списке для сессий, открытых
+# до его замены.
+AUTHENTICATION_BACKENDS = [
+    'users.backends.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+USER_CACHE_TIMEOUT = 5 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -142,11 +218,130 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Общий для всех процессов машины кеш в SQLite (core.sqlitecache): без
+# него у каждого воркера своя холодная копия, и сброс версий страниц не
+# доходит до остальных. При отладке и в тестах — кеш в памяти процесса.
+SHARED_CACHE = not DEBUG
+SHARED_CACHE_PATH = os.path.join(BASE_DIR, 'cache', 'yatube.sqlite3')
+
+if SHARED_CACHE:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.sqlitecache.SQLiteCache',
+            'LOCATION': SHARED_CACHE_PATH,
+            'TIMEOUT': 300,
+            'OPTIONS': {
+                'MAX_ENTRIES': 200000,
+                # Суммарный размер значений в байтах.
+                'MAX_SIZE': 512 * 1024 * 1024,
+                'COMPRESS_MIN_SIZE': 1024,
+                'CULL_FREQUENCY': 10,
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.instrumentation.LocMemCache',
+        }
     }
-}
 
 
 PGN_COUNT = 10
+COMMENTS_PGN_COUNT = 50
+# Нумерованные страницы (?page=N) показывают столько номеров по обе
+# стороны от текущего, плюс первый и последний; None — все номера.
+PGN_WINDOW = 3
+
+# Число записей для нумерованных страниц (posts.counts) хранится в кеше и
+# пересчитывается после записи в ленту или раз в COUNT_REFRESH_INTERVAL
+# секунд в стольких фоновых потоках; 0 — в самом запросе.
+COUNT_CACHE_TIMEOUT = 24 * 60 * 60
+COUNT_REFRESH_INTERVAL = 60
+COUNT_REFRESH_THREADS = 0 if DEBUG else 1
+
+# Авторы, у которых подписчиков не меньше этого числа, не раскладывают
+# новые посты по лентам подписчиков: их посты подмешиваются при чтении.
+TIMELINE_FANOUT_LIMIT = 1000
+# Подмешивание снова сменяется раскладкой, только когда подписчиков
+# меньше этого числа: автор у границы не достраивает ленты при каждой
+# отписке.
+TIMELINE_UNPULL_LIMIT = 800
+# Сколько последних постов автора попадает в ленту при подписке.
+TIMELINE_BACKFILL = 200
+
+# Страницы лент сбрасываются по версиям областей (core.cache), поэтому
+# срок жизни может быть длинным. При нескольких процессах версии должны
+# храниться в общем для них кеше.
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Срок жизни отрисованных карточек постов (posts.cards). Правка меняет
+# ключ карточки, так что устаревшие просто вытесняются.
+CARD_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Срок жизни кешированных наборов подписок (posts.follow_graph). Записи
+# сбрасывают набор сами, срок лишь ограничивает память.
+FOLLOW_GRAPH_TIMEOUT = 24 * 60 * 60
+
+# Миниатюры картинок постов строятся в пуле из стольких процессов;
+# 0 — строить в том же процессе.
+THUMBNAIL_WORKERS = 2
+# Через сколько секунд незавершённая миниатюра снова ставится в очередь.
+THUMBNAIL_PENDING_TIMEOUT = 60
+# Через сколько секунд картинка, миниатюру которой построить не удалось,
+# снова ставится в очередь.
+THUMBNAIL_FAILED_TIMEOUT = 24 * 60 * 60
+
+# Картинки постов при загрузке вписываются в этот размер и пережимаются.
+IMAGE_MAX_SIZE = (1920, 1920)
+IMAGE_QUALITY = 85
+# Файл картинки без ссылок не удаляется, если его сохраняли столько
+# секунд назад: пост с ним может быть ещё не зафиксирован (posts.images).
+IMAGE_RELEASE_GRACE = 60
+
+# Поиск в админке показывает не больше стольких лучших совпадений.
+SEARCH_ADMIN_LIMIT = 500
+
+# Замеры запросов в заголовке Server-Timing (core.middleware). Журнал —
+# по одной JSON-строке на запрос в логгер core.performance.
+PERFORMANCE_TIMING = DEBUG
+PERFORMANCE_LOG = False
+# Под manage.py test журнал не пишется в консоль: первый запрос процесса
+# отмечается всегда и засорял бы вывод тестов.
+TESTING = sys.argv[1:2] == ['test']
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.performance': {
+            'handlers': ['console'],
+            'level': 'WARNING' if TESTING else 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Записи из представлений (core.writes): при «database is locked»
+# транзакция повторяется до WRITE_RETRY_ATTEMPTS раз, с паузой до
+# WRITE_RETRY_DELAY * 2 ** попытка секунд (не больше WRITE_RETRY_MAX_DELAY).
+WRITE_RETRY_ATTEMPTS = 5
+WRITE_RETRY_DELAY = 0.05
+WRITE_RETRY_MAX_DELAY = 1.0
+# Комментарии из одновременных запросов процесса пишутся одной
+# транзакцией: первый ждёт соседей столько секунд, в пачке не больше
+# WRITE_BATCH_SIZE; 0 — каждый пишется сразу в своём запросе.
+WRITE_BATCH_WINDOW = 0 if DEBUG else 0.005
+WRITE_BATCH_SIZE = 100
+# Сколько секунд запрос ждёт, пока его запись зафиксируют.
+WRITE_ACK_TIMEOUT = 10
+
+# JSON API (api): наибольший размер страницы в ?limit= и число объектов
+# в одном запросе batch.
+API_PAGE_MAX = 100
+API_BATCH_MAX = 100